@@ -0,0 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = 32
+
+
+class AsyncVolume:
+    """asyncio front-end sharing one mounted Fat32_Main or NTFS volume.
+
+    Calls run in a thread pool against the shared, thread-safe volume; each
+    read gets a stream of its own, so no file position is shared.
+    """
+
+    def __init__(self, volume, executor=None, workers=WORKERS) -> None:
+        self.volume = volume
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=workers)
+        self.ownExecutor = executor is None
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def listDirSync(self, path: str) -> 'list[dict]':
+        _, dirs, files = next(self.volume.walk(path))
+        return dirs + files
+
+    def statSync(self, path: str) -> dict:
+        return self.volume.stat(path)
+
+    def readSync(self, path: str, offset: int, length: int) -> bytes:
+        with self.volume.open(path) as stream:
+            stream.seek(offset)
+            return stream.read(length)
+
+    async def list_dir(self, path: str = "") -> 'list[dict]':
+        """Entries of a directory, the current one by default, as getDirectory dicts."""
+        return await self.run(self.listDirSync, path)
+
+    async def stat(self, path: str) -> dict:
+        return await self.run(self.statSync, path)
+
+    async def read(self, path: str, offset: int = 0, length: int = -1) -> bytes:
+        return await self.run(self.readSync, path, offset, length)
+
+    def close(self):
+        if self.ownExecutor:
+            self.executor.shutdown()
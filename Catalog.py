@@ -0,0 +1,194 @@
+import csv
+import fnmatch
+import re
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Attribute bits shared by FAT32 directory entries and NTFS $STANDARD_INFORMATION
+ATTRIBUTES = {
+    "readonly": 0x01,
+    "hidden": 0x02,
+    "system": 0x04,
+    "dir": 0x10,
+    "archive": 0x20,
+}
+
+
+class FileCatalog:
+    """Flat, columnar list of every file and directory of a volume.
+
+    Rows are appended parent first; paths are rebuilt from the parent
+    column when results are returned. Name lookups go through an exact
+    name map and a sorted name list, so only patterns without a literal
+    prefix fall back to scanning the name column.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.names: list[str] = []
+        self.parents = array('q')
+        self.sizes = array('q')
+        self.flags = array('l')
+        self.ctimes = array('d')
+        self.mtimes = array('d')
+        self.byName: 'dict[str, list[int]] | None' = None
+        self.sortedNames: 'list[tuple[str, int]] | None' = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, parent: int, name: str, size: int, flags: int, mtime: float, ctime: float = 0.0) -> int:
+        self.names.append(name)
+        self.parents.append(parent)
+        self.sizes.append(size)
+        self.flags.append(flags)
+        self.ctimes.append(ctime)
+        self.mtimes.append(mtime)
+        self.byName = self.sortedNames = None
+        return len(self.names) - 1
+
+    def path(self, row: int) -> str:
+        parts = []
+        # Bounded, so a parent loop on a damaged volume cannot hang
+        while row >= 0 and len(parts) <= len(self.names):
+            parts.append(self.names[row])
+            row = self.parents[row]
+        parts.append(self.root)
+        return "\\".join(reversed(parts))
+
+    def buildIndex(self):
+        self.byName = {}
+        for row, name in enumerate(self.names):
+            self.byName.setdefault(name.casefold(), []).append(row)
+        self.sortedNames = sorted((name, row) for name, rows in self.byName.items() for row in rows)
+
+    def matchName(self, pattern=None, regex=None) -> 'list[int] | range':
+        if self.byName is None:
+            self.buildIndex()
+        if pattern is None and regex is None:
+            return range(len(self.names))
+
+        if pattern is not None:
+            pattern = pattern.casefold()
+            wildcard = re.search(r"[*?\[]", pattern)
+            if wildcard is None:
+                rows = self.byName.get(pattern, [])
+            else:
+                # Only names sharing the literal prefix can match
+                prefix = pattern[:wildcard.start()]
+                start = bisect_left(self.sortedNames, (prefix,))
+                matcher = re.compile(fnmatch.translate(pattern))
+                rows = []
+                for name, row in self.sortedNames[start:]:
+                    if not name.startswith(prefix):
+                        break
+                    if matcher.match(name):
+                        rows.append(row)
+        else:
+            rows = range(len(self.names))
+
+        if regex is not None:
+            matcher = re.compile(regex, re.IGNORECASE)
+            rows = [row for row in rows if matcher.search(self.names[row])]
+        return rows
+
+    def find(self, pattern=None, regex=None, minSize=None, maxSize=None,
+             after: datetime = None, before: datetime = None, attributes=0, excludeAttributes=0):
+        """Return (path, row) pairs matching every given filter, sorted by path."""
+        after = after.timestamp() if after is not None else None
+        before = before.timestamp() if before is not None else None
+
+        results = []
+        for row in self.matchName(pattern, regex):
+            if minSize is not None and self.sizes[row] < minSize:
+                continue
+            if maxSize is not None and self.sizes[row] > maxSize:
+                continue
+            if after is not None and self.mtimes[row] < after:
+                continue
+            if before is not None and self.mtimes[row] >= before:
+                continue
+            if self.flags[row] & attributes != attributes or self.flags[row] & excludeAttributes:
+                continue
+            results.append((self.path(row), row))
+        results.sort()
+        return results
+
+    def toDict(self, row: int) -> dict:
+        return {
+            "Flags": self.flags[row],
+            "Date Created": datetime.fromtimestamp(self.ctimes[row]),
+            "Date Modified": datetime.fromtimestamp(self.mtimes[row]),
+            "Size": self.sizes[row],
+            "Name": self.names[row],
+        }
+
+    @classmethod
+    def fromWalk(cls, root: str, walk) -> 'FileCatalog':
+        """Build from a volume's walk(); directories are added before their contents.
+
+        An unset creation date (FAT32 leaves it optional) takes the modification time.
+        """
+        catalog = cls(root)
+        rows = {root: -1}
+        for dirpath, dirs, files in walk:
+            parent = rows.get(dirpath, -1)
+            for obj in dirs:
+                rows[dirpath + "\\" + obj["Name"]] = catalog.add(
+                    parent, obj["Name"], obj["Size"], obj["Flags"] | ATTRIBUTES["dir"], obj["Date Modified"].timestamp(),
+                    (obj["Date Created"] or obj["Date Modified"]).timestamp())
+            for obj in files:
+                catalog.add(parent, obj["Name"], obj["Size"], obj["Flags"], obj["Date Modified"].timestamp(),
+                            (obj["Date Created"] or obj["Date Modified"]).timestamp())
+        return catalog
+
+    @classmethod
+    def fromColumns(cls, root: str, ids, parents, names, sizes, flags, ctimes, mtimes, rootID: int) -> 'FileCatalog':
+        """Build from per-record columns keyed by record number, such as an MFT scan.
+
+        Parents are given as record numbers; those of rootID, and those not
+        in the columns at all, become children of the root.
+        """
+        catalog = cls(root)
+        keep = [i for i, fileID in enumerate(ids) if fileID != rootID]
+        rows = {ids[i]: row for row, i in enumerate(keep)}
+        catalog.names = [names[i] for i in keep]
+        catalog.parents = array('q', [rows.get(parents[i], -1) for i in keep])
+        catalog.sizes = array('q', [sizes[i] for i in keep])
+        catalog.flags = array('l', [flags[i] for i in keep])
+        catalog.ctimes = array('d', [ctimes[i] for i in keep])
+        catalog.mtimes = array('d', [mtimes[i] for i in keep])
+        return catalog
+
+    def export(self, path: str):
+        """Write every row with its full path, as CSV or, for a .npz path, as NumPy columns.
+
+        The .npz form keeps the columns as they are, with names as one UTF-8
+        string table (names, cut at nameOffsets) and parents as row numbers.
+        """
+        if path.endswith(".npz"):
+            if numpy is None:
+                raise Exception("Exporting .npz needs NumPy")
+            encoded = [name.encode() for name in self.names]
+            offsets = array('q', [0])
+            for name in encoded:
+                offsets.append(offsets[-1] + len(name))
+            numpy.savez(path, names=numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8),
+                        nameOffsets=numpy.array(offsets), parents=numpy.array(self.parents),
+                        sizes=numpy.array(self.sizes), flags=numpy.array(self.flags),
+                        ctimes=numpy.array(self.ctimes), mtimes=numpy.array(self.mtimes))
+            return
+
+        with open(path, "w", newline="", encoding="utf-8") as fd:
+            writer = csv.writer(fd)
+            writer.writerow(["path", "size", "flags", "created", "modified"])
+            for row in range(len(self.names)):
+                writer.writerow([self.path(row), self.sizes[row], self.flags[row],
+                                 datetime.fromtimestamp(self.ctimes[row]).isoformat(),
+                                 datetime.fromtimestamp(self.mtimes[row]).isoformat()])
@@ -0,0 +1,305 @@
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+
+SECTOR_SIZE = 512
+# A multiple of every cluster size FAT32 and NTFS use by default
+BLOCK_SIZE = 64 * 1024
+CACHE_BYTES = 32 * 1024 * 1024
+MAX_READAHEAD = 16
+
+
+class BlockDevice:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def invalidate(self):
+        """Forget anything cached, the volume may have changed underneath."""
+        pass
+
+    def align(self, origin: int):
+        """Hint the byte offset clusters are counted from, so caches can keep blocks cluster-aligned."""
+        pass
+
+    def close(self):
+        pass
+
+
+class FileDevice(BlockDevice):
+    """Raw volume or image file read with positional reads.
+
+    Where os.pread exists there is no shared file position, so any number
+    of threads can read at once; elsewhere seek and read run under a lock.
+    Raw Windows volumes only accept sector-aligned transfers, so unaligned
+    requests are widened to whole sectors and trimmed afterwards.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        self.lock = threading.Lock()
+
+    def pread(self, length: int, offset: int) -> bytes:
+        if hasattr(os, 'pread'):
+            return os.pread(self.fd, length, offset)
+        with self.lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            return os.read(self.fd, length)
+
+    def read_at(self, offset: int, length: int):
+        begin = offset - offset % SECTOR_SIZE
+        end = -(-(offset + length) // SECTOR_SIZE) * SECTOR_SIZE
+        data = self.pread(end - begin, begin)
+        if begin == offset and len(data) <= length:
+            return data
+        return data[offset - begin:offset - begin + length]
+
+    def readinto_at(self, offset: int, buffer) -> int:
+        if offset % SECTOR_SIZE or len(buffer) % SECTOR_SIZE or not hasattr(os, 'preadv'):
+            data = self.read_at(offset, len(buffer))
+            buffer[:len(data)] = data
+            return len(data)
+        return os.preadv(self.fd, [buffer], offset)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class MemoryDevice(BlockDevice):
+    """Volume image held in memory; reads are zero-copy memoryview slices."""
+
+    def __init__(self, buffer) -> None:
+        self.view = memoryview(buffer).cast('B')
+
+    def __len__(self):
+        return len(self.view)
+
+    def read_at(self, offset: int, length: int):
+        return self.view[offset:offset + length]
+
+    def readinto_at(self, offset: int, buffer) -> int:
+        data = self.view[offset:offset + len(buffer)]
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.view.release()
+
+
+class MmapDevice(MemoryDevice):
+    """Disk image file mapped read-only into memory."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as fd:
+            self.map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(self.map)
+
+    def close(self):
+        super().close()
+        try:
+            self.map.close()
+        except BufferError:
+            # Parsed records still hold slices; the map goes away with them
+            pass
+
+
+class CachedDevice(BlockDevice):
+    """LRU cache of fixed-size blocks in front of another device.
+
+    Consecutive misses grow a read-ahead window (up to MAX_READAHEAD
+    blocks) fetched in the same request; a random miss resets it. Missing
+    blocks of one request are fetched as contiguous runs. Blocks are
+    counted from origin, so with the start of the data area there no
+    cluster straddles two blocks.
+    """
+
+    def __init__(self, device, capacity=CACHE_BYTES, block_size=BLOCK_SIZE, origin=0) -> None:
+        self.device = device
+        self.block_size = block_size
+        self.origin = origin % block_size
+        self.max_blocks = max(capacity // block_size, 1)
+        self.blocks: 'OrderedDict[int, bytes]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_block = None
+        self.window = 1
+        self.hits = 0
+        self.misses = 0
+        self.reads = 0
+        self.readahead = 0
+
+    def lookup(self, block: int):
+        with self.lock:
+            data = self.blocks.get(block)
+            if data is None:
+                self.misses += 1
+            else:
+                self.blocks.move_to_end(block)
+                self.hits += 1
+            return data
+
+    def fetch(self, first: int, count: int) -> 'list[bytes]':
+        with self.lock:
+            # lookup() counted the first block of the run already
+            self.misses += count - 1
+            # Sequential misses double the read-ahead, anything else starts over
+            if first == self.next_block:
+                self.window = min(self.window * 2, MAX_READAHEAD)
+            else:
+                self.window = 1
+            extra = max(self.window - count, 0)
+            self.next_block = first + count
+            self.reads += 1
+            self.readahead += extra
+        begin = self.origin + first * self.block_size
+        end = begin + (count + extra) * self.block_size
+        data = self.device.read_at(max(begin, 0), end - max(begin, 0))
+        if begin < 0:
+            # The block before origin runs past the start of the device
+            data = bytes(-begin) + bytes(data)
+        blocks = [bytes(data[i:i + self.block_size]) for i in range(0, len(data), self.block_size)]
+        with self.lock:
+            for i, block in enumerate(blocks):
+                self.blocks[first + i] = block
+                self.blocks.move_to_end(first + i)
+            while len(self.blocks) > self.max_blocks:
+                self.blocks.popitem(last=False)
+        return blocks[:count]
+
+    def read_at(self, offset: int, length: int):
+        if length <= 0:
+            return b''
+        first = (offset - self.origin) // self.block_size
+        last = (offset - self.origin + length - 1) // self.block_size
+        parts = []
+        block = first
+        while block <= last:
+            data = self.lookup(block)
+            if data is not None:
+                parts.append(data)
+                block += 1
+                continue
+            # Gather the run of missing blocks and read it at once
+            end = block + 1
+            while end <= last and end not in self.blocks:
+                end += 1
+            fetched = self.fetch(block, end - block)
+            parts.extend(fetched)
+            if len(fetched) < end - block:
+                break
+            block = end
+        start = offset - self.origin - first * self.block_size
+        if len(parts) == 1:
+            return parts[0][start:start + length]
+        return b''.join(parts)[start:start + length]
+
+    def readinto_at(self, offset: int, buffer) -> int:
+        data = self.read_at(offset, len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "blocks": len(self.blocks),
+            "capacity": self.max_blocks,
+            "block size": self.block_size,
+            "origin": self.origin,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit rate": self.hits / lookups if lookups else 0.0,
+            "reads": self.reads,
+            "readahead blocks": self.readahead,
+        }
+
+    def invalidate(self):
+        with self.lock:
+            self.blocks.clear()
+            self.next_block = None
+        self.device.invalidate()
+
+    def align(self, origin: int):
+        with self.lock:
+            if origin % self.block_size != self.origin:
+                # Block numbers mean other byte ranges from here on
+                self.origin = origin % self.block_size
+                self.blocks.clear()
+                self.next_block = None
+        self.device.align(origin)
+
+    def close(self):
+        self.blocks.clear()
+        self.device.close()
+
+
+class InstrumentedDevice(BlockDevice):
+    """Counts the requests, bytes and seeks that reach the wrapped device.
+
+    A seek is a request that does not start where the previous one ended.
+    """
+
+    def __init__(self, device, stats) -> None:
+        self.device = device
+        self.stats = stats
+        self.position = 0
+
+    def account(self, offset: int, length: int):
+        stats = self.stats
+        stats.count('device reads')
+        stats.count('bytes read', length)
+        if offset != self.position:
+            stats.count('seeks')
+        self.position = offset + length
+
+    def read_at(self, offset: int, length: int):
+        with self.stats.phase('device read'):
+            data = self.device.read_at(offset, length)
+        self.account(offset, len(data))
+        return data
+
+    def invalidate(self):
+        self.device.invalidate()
+
+    def align(self, origin: int):
+        self.device.align(origin)
+
+    def readinto_at(self, offset: int, buffer) -> int:
+        with self.stats.phase('device read'):
+            count = self.device.readinto_at(offset, buffer)
+        self.account(offset, count)
+        return count
+
+    def close(self):
+        self.device.close()
+
+
+def open_device(name: str, backend: str = 'auto', cache: int = 0, stats=None):
+    """Open a drive letter such as 'C:' or a path to a disk image.
+
+    With cache > 0, file-backed devices get a CachedDevice of that many
+    bytes; memory-backed ones are served from memory already. With stats,
+    requests reaching the underlying device are counted into it.
+    """
+    if re.fullmatch(r'[A-Za-z]:', name):
+        device = FileDevice(rf'\\.\{name}')
+    elif backend == 'memory':
+        with open(name, 'rb') as fd:
+            device = MemoryDevice(fd.read())
+    elif backend in ('auto', 'mmap') and os.path.isfile(name) and os.path.getsize(name) > 0:
+        device = MmapDevice(name)
+    else:
+        device = FileDevice(name)
+    in_memory = isinstance(device, MemoryDevice)
+    if stats is not None:
+        device = InstrumentedDevice(device, stats)
+    if cache > 0 and not in_memory:
+        device = CachedDevice(device, cache)
+    return device
@@ -0,0 +1,119 @@
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Catalog import ATTRIBUTES
+from Stream import CHUNK_SIZE
+
+WORKERS = 4
+
+
+def host_name(name: str) -> str:
+    # Volume names may hold characters that are separators on the host
+    return name.replace("/", "_").replace("\\", "_")
+
+
+def is_extracted(host_path: str, obj: dict) -> bool:
+    # A finished copy has the volume size and modification time; partial ones are still .part files
+    try:
+        st = os.stat(host_path)
+    except OSError:
+        return False
+    return st.st_size == obj["Size"] and int(st.st_mtime) == int(obj["Date Modified"].timestamp())
+
+
+def copy_file(stream, host_path: str, obj: dict, chunk_size=CHUNK_SIZE) -> int:
+    part = host_path + ".part"
+    with stream, open(part, "wb") as fd:
+        shutil.copyfileobj(stream, fd, chunk_size)
+        written = fd.tell()
+    mtime = obj["Date Modified"].timestamp()
+    os.utime(part, (mtime, mtime))
+    os.replace(part, host_path)
+    return written
+
+
+def extract_file(volume, volume_path: str, host_path: str, obj: dict) -> int:
+    return copy_file(volume.open(volume_path), host_path, obj)
+
+
+def collect(volume, src: str, dest: str = None) -> 'list[tuple[str, str, dict]]':
+    """List (volume path, host path, entry) of every file under src, hidden and system ones included.
+
+    With dest, the host directories are created on the way; without it the
+    host paths are None.
+    """
+    if dest is not None:
+        os.makedirs(dest, exist_ok=True)
+    # The entry comes from the resolved path, so hidden and system files are found too;
+    # "", "." and ".." always name directories and are left to walk
+    if volume.parsePath(src)[-1] not in ("", ".", ".."):
+        obj = volume.stat(src)
+        if not obj["Flags"] & ATTRIBUTES["dir"]:
+            return [(src, None if dest is None else os.path.join(dest, host_name(obj["Name"])), obj)]
+
+    jobs = []
+    top = None
+    for dirpath, dirs, files in volume.walk(src, hidden=True):
+        if top is None:
+            top = dirpath
+        if dest is None:
+            jobs.extend((dirpath + "\\" + obj["Name"], None, obj) for obj in files)
+            continue
+        parts = [host_name(part) for part in dirpath[len(top):].split("\\") if part]
+        host_dir = os.path.join(dest, *parts)
+        for obj in dirs:
+            os.makedirs(os.path.join(host_dir, host_name(obj["Name"])), exist_ok=True)
+        for obj in files:
+            jobs.append((dirpath + "\\" + obj["Name"], os.path.join(host_dir, host_name(obj["Name"])), obj))
+    return jobs
+
+
+def finish(job, stats, update):
+    volume_path, future = job
+    try:
+        update(future.result())
+    except Exception as e:
+        stats["failed"] += 1
+        print(f"[ERROR] {volume_path}: {e}")
+
+
+def extract(volume, src: str, dest: str, workers=WORKERS, resume=True, progress=None) -> dict:
+    """Copy the file or directory subtree src of a volume into the host directory dest.
+
+    Files are read in on-disk order by a bounded thread pool. With resume,
+    files already copied by an earlier run are skipped. progress, if given,
+    is called with the running statistics after every file.
+    """
+    start = time.perf_counter()
+    stats = {"files": 0, "bytes": 0, "skipped": 0, "failed": 0, "seconds": 0.0, "MB/s": 0.0, "files/s": 0.0}
+
+    def update(written):
+        stats["files"] += 1
+        stats["bytes"] += written
+        stats["seconds"] = time.perf_counter() - start
+        if stats["seconds"] > 0:
+            stats["MB/s"] = stats["bytes"] / stats["seconds"] / (1024 * 1024)
+            stats["files/s"] = stats["files"] / stats["seconds"]
+        if progress is not None:
+            progress(stats)
+
+    jobs = collect(volume, src, dest)
+    # "Sector" is where the data starts on disk; reading in that order keeps seeks short
+    jobs.sort(key=lambda job: job[2]["Sector"])
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for volume_path, host_path, obj in jobs:
+            if resume and is_extracted(host_path, obj):
+                stats["skipped"] += 1
+                continue
+            pending.append((volume_path, pool.submit(extract_file, volume, volume_path, host_path, obj)))
+            if len(pending) >= workers * 2:
+                finish(pending.popleft(), stats, update)
+        while pending:
+            finish(pending.popleft(), stats, update)
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
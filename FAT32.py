@@ -1,27 +1,83 @@
 from enum import Flag, auto
 from datetime import datetime
-from itertools import chain
+from array import array
+from collections import OrderedDict
 import re
+import sys
+import struct
+import threading
+from codecs import utf_16_le_decode
+from Catalog import FileCatalog
+from Device import CachedDevice, open_device
+from Stats import NULL_STATS, timed
+from Stream import ExtentStream, iter_text, read_batch
 
 BOOT_SECTOR_SIZE = 512
+DET_CACHE_BYTES = 64 * 1024 * 1024
+# Rough resident size of one parsed RDETentry, used to weigh cached tables
+ENTRY_COST = 300
 
 
 class FAT:
-    def __init__(self, data):
-        self.raw_data = data
-        self.elements = []
+    def __init__(self, device, offset, size, bytes_per_sector=BOOT_SECTOR_SIZE, stats=NULL_STATS):
+        self.device = device
+        self.stats = stats
+        self.offset = offset
+        self.bytes_per_sector = bytes_per_sector
+        self.entries_per_sector = bytes_per_sector // 4
+        # Read and decoded lazily, one FAT sector at a time, into a compact array of uint32
+        self.elements = array('I', bytes(size // 4 * 4))
+        self.decoded = bytearray((size + bytes_per_sector - 1) // bytes_per_sector)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.elements)
+
+    def decode_sector(self, sector):
+        with self.lock:
+            # Another thread may have decoded it while this one waited
+            if not self.decoded[sector]:
+                self.read_sector(sector)
+
+    @timed("FAT decode")
+    def read_sector(self, sector):
+        begin = sector * self.entries_per_sector
+        end = min(begin + self.entries_per_sector, len(self.elements))
+        values = array('I')
+        values.frombytes(self.device.read_at(self.offset + begin * 4, (end - begin) * 4))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        self.elements[begin:end] = values
+        self.decoded[sector] = 1
+
+    def get_entry(self, index: int) -> int:
+        sector = index // self.entries_per_sector
+        if not self.decoded[sector]:
+            self.decode_sector(sector)
+        return self.elements[index] & 0x0FFFFFFF
 
     def get_cluster_chain(self, starting_index: int) -> 'list[int]':
-        for i in range(0, len(self.raw_data), 4):
-            self.elements.append(int.from_bytes(self.raw_data[i:i + 4], 'little'))
-
         cluster_list = []
         while True:
+            if not 2 <= starting_index < len(self.elements):
+                raise Exception("Invalid cluster in chain")
+            if len(cluster_list) >= len(self.elements):
+                raise Exception("Cluster chain has a loop")
             cluster_list.append(starting_index)
-            starting_index = self.elements[starting_index]
-            if starting_index == 0x0FFFFFFF or starting_index == 0x0FFFFFF7:
+            starting_index = self.get_entry(starting_index)
+            if starting_index >= 0x0FFFFFF8 or starting_index == 0x0FFFFFF7:
                 return cluster_list
 
+    def get_cluster_runs(self, starting_index: int) -> 'list[tuple[int, int]]':
+        # Collapse the chain into (first cluster, cluster count) extents
+        runs = []
+        for cluster in self.get_cluster_chain(starting_index):
+            if runs and runs[-1][0] + runs[-1][1] == cluster:
+                runs[-1][1] += 1
+            else:
+                runs.append([cluster, 1])
+        return [(first, count) for first, count in runs]
+
 
 class Attribute(Flag):
     READ_ONLY = auto()
@@ -32,48 +88,34 @@ class Attribute(Flag):
     ARCHIVE = auto()
 
 
-class RDETentry:
-    def __init__(self, data) -> None:
-        self.raw_data = data
-        self.entry_name = ''
-        self.parse_entry()
-
-    def parse_entry(self):
-        self.flag = self.raw_data[0xB:0xC]
-        # so sanh flag co bang \xof ko roi gan true false vo is_subentry
-        # cac dong con lai lam tuong tu
-        self.is_subentry = self.flag == b'\x0f'
-        self.is_deleted = self.raw_data[0] == 0xe5
-        self.is_empty = self.raw_data[0] == 0x00
-        self.is_label = Attribute.VOL_LABLE in Attribute(int.from_bytes(self.flag, byteorder='little'))
-
-        if not self.is_subentry:
-            self.name = self.raw_data[:0x8]
-            self.ext = self.raw_data[0x8:0xB]
-
-            if self.is_deleted or self.is_empty:
-                self.name = ""
-                return
+ATTRIBUTE_MASK = 0x3F
+ATTRIBUTE_FLAGS = tuple(Attribute(value) for value in range(ATTRIBUTE_MASK + 1))
+# One 32-byte directory slot: 8.3 name, attributes, reserved, creation tenths and time, creation date,
+# access date, high cluster word, modification time and date, low cluster word, size
+SLOT = struct.Struct('<11sBBBHHHHHHHI')
+SLOT_SIZE = 32
+LFN = 0x0F
+DELETED = 0xE5
 
-            self.attr = Attribute(int.from_bytes(self.flag, byteorder='little'))
-            if Attribute.VOL_LABLE in self.attr:
-                self.is_label = True
-                return
-
-            self.set_date_time()
-            self.start_cluster, self.size = self.extract_start_cluster_size()
-        else:
-            self.index = self.raw_data[0]
-            self.name = self.extract_long_name()
-
-    def set_date_time(self):
-        self.time_created_raw = int.from_bytes(self.raw_data[0xD:0x10], byteorder='little')
-        self.date_created_raw = int.from_bytes(self.raw_data[0x10:0x12], byteorder='little')
-        self.date_last_accessed_raw = int.from_bytes(self.raw_data[0x12:0x14], byteorder='little')
-
-        self.time_updated_raw = int.from_bytes(self.raw_data[0x16:0x18], byteorder='little')
-        self.date_updated_raw = int.from_bytes(self.raw_data[0x18:0x1A], byteorder='little')
 
+class RDETentry:
+    # Kept compact: no per-instance __dict__, timestamps stay packed until read
+    __slots__ = ('entry_name', 'attr', 'start_cluster', 'size',
+                 'time_created_raw', 'date_created_raw', 'date_last_accessed_raw',
+                 'time_updated_raw', 'date_updated_raw')
+
+    def __init__(self, entry_name: str, fields: tuple) -> None:
+        # fields is one slot unpacked with SLOT
+        (_, attr, _, tenths, time_created, self.date_created_raw, self.date_last_accessed_raw, high,
+         self.time_updated_raw, self.date_updated_raw, low, self.size) = fields
+        self.entry_name = entry_name
+        self.attr = ATTRIBUTE_FLAGS[attr & ATTRIBUTE_MASK]
+        self.time_created_raw = tenths | time_created << 8
+        self.start_cluster = (high << 16) | low
+
+    @property
+    def date_created(self) -> 'datetime | None':
+        # Optional on FAT: None when it was never set (0) or is not a valid date
         hours = (self.time_created_raw & 0b111110000000000000000000) >> 19
         minutes = (self.time_created_raw & 0b000001111110000000000000) >> 13
         seconds = (self.time_created_raw & 0b000000000001111110000000) >> 7
@@ -81,39 +123,33 @@ class RDETentry:
         year = 1980 + ((self.date_created_raw & 0b1111111000000000) >> 9)
         month = (self.date_created_raw & 0b0000000111100000) >> 5
         day = self.date_created_raw & 0b0000000000011111
-        self.date_created = datetime(year, month, day, hours, minutes, seconds, ms)
+        try:
+            return datetime(year, month, day, hours, minutes, seconds, ms)
+        except ValueError:
+            return None
 
+    @property
+    def last_accessed(self) -> 'datetime | None':
         year = 1980 + ((self.date_last_accessed_raw & 0b1111111000000000) >> 9)
         mon = (self.date_last_accessed_raw & 0b0000000111100000) >> 5
         day = self.date_last_accessed_raw & 0b0000000000011111
-        self.last_accessed = datetime(year, mon, day)
+        try:
+            return datetime(year, mon, day)
+        except ValueError:
+            return None
 
+    @property
+    def date_updated(self) -> datetime:
         hours = (self.time_updated_raw & 0b1111100000000000) >> 11
         minutes = (self.time_updated_raw & 0b0000011111100000) >> 5
         seconds = (self.time_updated_raw & 0b0000000000011111) * 2
         year = 1980 + ((self.date_updated_raw & 0b1111111000000000) >> 9)
         month = (self.date_updated_raw & 0b0000000111100000) >> 5
         day = self.date_updated_raw & 0b0000000000011111
-        self.date_updated = datetime(year, month, day, hours, minutes, seconds)
-
-    def extract_start_cluster_size(self):
-        start_cluster_bytes = self.raw_data[0x14:0x16][::-1] + self.raw_data[0x1A:0x1C][::-1]
-        start_cluster = int.from_bytes(start_cluster_bytes, byteorder='big')
-        size = int.from_bytes(self.raw_data[0x1C:0x20], byteorder='little')
-        return start_cluster, size
-
-    def extract_long_name(self):
-        name = b""
-        for i in chain(range(0x1, 0xB), range(0xE, 0x1A), range(0x1C, 0x20)):
-            name += int.to_bytes(self.raw_data[i], 1, byteorder='little')
-            if name.endswith(b"\xff\xff"):
-                name = name[:-2]
-                break
-        return name.decode('utf-16le').strip('\x00')
+        return datetime(year, month, day, hours, minutes, seconds)
 
     def is_active_entry(self) -> bool:
-        return not (
-                    self.is_empty or self.is_subentry or self.is_deleted or self.is_label or Attribute.SYSTEM in self.attr)
+        return Attribute.SYSTEM not in self.attr
 
     def is_directory(self) -> bool:
         return Attribute.DIRECTORY in self.attr
@@ -125,57 +161,152 @@ class RDETentry:
 class RDET:
     def __init__(self, data: bytes) -> None:
         self.raw_data = data
-        self.entries: list[RDETentry] = []
-        self.entries = self.get_full_entry_name()
-
-    def get_full_entry_name(self) -> list[RDETentry]:
-        entry_name = ''
-        entries: list[RDETentry] = []
+        self._entries: 'list[RDETentry] | None' = None
+        self.name_index: 'dict[str, RDETentry] | None' = None
+
+    @property
+    def entries(self) -> 'list[RDETentry]':
+        # Decoded on first use; a racing thread at worst decodes the same table twice
+        entries = self._entries
+        if entries is None:
+            entries = self._entries = list(self.iter_entries())
+        return entries
 
-        for i in range(0, len(self.raw_data), 32):
-            entries.append(RDETentry(self.raw_data[i: i + 32]))
-            if entries[-1].is_empty or entries[-1].is_deleted:
-                entry_name = ''
+    def iter_entries(self):
+        """Decode the table in one pass, yielding only the live files and directories.
+
+        Slots are unpacked in bulk with struct.iter_unpack over the part of
+        the table before the end marker; free, deleted and volume label slots
+        are skipped, and long names are assembled from the LFN slots before
+        each short entry.
+        """
+        data = memoryview(self.raw_data)
+        # A slot starting with 0x00 ends the table, nothing after it is in use
+        end = bytes(data[0::SLOT_SIZE]).find(0)
+        if end < 0:
+            end = len(data) // SLOT_SIZE
+        parts = []
+        for i, fields in enumerate(SLOT.iter_unpack(data[:end * SLOT_SIZE])):
+            name = fields[0]
+            attr = fields[1]
+            if name[0] == DELETED:
+                parts.clear()
                 continue
-            elif entries[-1].is_subentry:
-                entry_name = entries[-1].name + entry_name
+            if attr == LFN:
+                # LFN slots come last part first; each holds 13 UTF-16 characters in three runs
+                slot = i * SLOT_SIZE
+                parts.append(data[slot + 0x1:slot + 0xB])
+                parts.append(data[slot + 0xE:slot + 0x1A])
+                parts.append(data[slot + 0x1C:slot + 0x20])
+                continue
+            if attr & Attribute.VOL_LABLE.value:
+                parts.clear()
                 continue
 
-            if entry_name != '':
-                entries[-1].entry_name = entry_name
+            if parts:
+                # Reverse the slots, not the three runs inside each of them
+                raw = b"".join(b"".join(parts[k:k + 3]) for k in range(len(parts) - 3, -1, -3))
+                entry_name = utf_16_le_decode(raw)[0]
+                terminator = entry_name.find('\x00')
+                if terminator >= 0:
+                    entry_name = entry_name[:terminator]
+                parts.clear()
             else:
-                extension = entries[-1].ext.strip().decode()
-                if extension != '':
-                    entries[-1].entry_name = entries[-1].name.strip().decode() + '.' + extension
-                else:
-                    entries[-1].entry_name = entries[-1].name.strip().decode()
-            entry_name = ''
-        return entries
+                base = name[:8].strip().decode()
+                extension = name[8:].strip().decode()
+                entry_name = base + '.' + extension if extension else base
+            yield RDETentry(entry_name, fields)
 
     def get_active_entries(self) -> 'list[RDETentry]':
-        entry_list = []
-        for i in range(len(self.entries)):
-            if self.entries[i].is_active_entry():
-                entry_list.append(self.entries[i])
-        return entry_list
+        return [entry for entry in self.entries if entry.is_active_entry()]
 
     def find_entry(self, name) -> RDETentry:
-        for i in range(len(self.entries)):
-            if self.entries[i].is_active_entry() and self.entries[i].entry_name.lower() == name.lower():
-                return self.entries[i]
-        return None
+        # Case-folded name -> entry, built the first time the directory is searched; system
+        # entries are included so every path walk(hidden=True) lists can be resolved
+        # Published only once complete, so concurrent readers never see a partial index
+        if self.name_index is None:
+            name_index = {}
+            for entry in self.entries:
+                name_index.setdefault(entry.entry_name.casefold(), entry)
+            self.name_index = name_index
+        return self.name_index.get(name.casefold())
+
+
+class DirectoryCache:
+    """LRU of parsed directory tables, bounded by an estimate of their memory use.
+
+    Pinned tables (the root) never count against the budget or get evicted.
+    All methods may be called from several threads.
+    """
+
+    def __init__(self, budget=DET_CACHE_BYTES) -> None:
+        self.budget = budget
+        self.tables: 'OrderedDict[int, RDET]' = OrderedDict()
+        self.pinned: 'dict[int, RDET]' = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cost(rdet: RDET) -> int:
+        # Charged from the slot count, an upper bound on the entries, so caching does not decode the table
+        return len(rdet.raw_data) + len(rdet.raw_data) // SLOT_SIZE * ENTRY_COST
+
+    def pin(self, cluster: int, rdet: RDET):
+        self.pinned[cluster] = rdet
+
+    def get(self, cluster: int) -> 'RDET | None':
+        with self.lock:
+            rdet = self.pinned.get(cluster)
+            if rdet is None:
+                rdet = self.tables.get(cluster)
+                if rdet is not None:
+                    self.tables.move_to_end(cluster)
+            if rdet is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return rdet
+
+    def put(self, cluster: int, rdet: RDET):
+        with self.lock:
+            if cluster in self.pinned:
+                return
+            if cluster in self.tables:
+                self.size -= self.cost(self.tables.pop(cluster))
+            self.tables[cluster] = rdet
+            self.size += self.cost(rdet)
+            # Always keep the newest table, even if it alone exceeds the budget
+            while self.size > self.budget and len(self.tables) > 1:
+                _, old = self.tables.popitem(last=False)
+                self.size -= self.cost(old)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "tables": len(self.tables) + len(self.pinned),
+            "bytes": self.size,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
 
 
 class Fat32_Main:
-    def __init__(self, volume_name) -> None:
+    def __init__(self, volume_name, device=None, det_cache_bytes=DET_CACHE_BYTES, stats=None) -> None:
         self.volume_name = volume_name
         self.cwd = [self.volume_name]
+        self.catalog = None
+        self.stats = stats if stats is not None else NULL_STATS
 
         try:
-            self.bin_raw_data = open(rf"\\.\{self.volume_name}", 'rb')
+            self.device = device if device is not None else open_device(self.volume_name, stats=stats)
             self.boot_sector = {}
 
-            self.boot_sector_data = self.bin_raw_data.read(BOOT_SECTOR_SIZE)
+            self.boot_sector_data = bytes(self.device.read_at(0, BOOT_SECTOR_SIZE))
             self.extract_boot_sector()
             if self.boot_sector['FAT Name'] != b'FAT32   ':
                 raise Exception('NOT FAT32')
@@ -190,26 +321,39 @@ class Fat32_Main:
             self.sectors_per_fats = self.boot_sector['Sectors Per FAT']
             self.starting_cluster_of_rdet = self.boot_sector['Starting Cluster of RDET']
             self.starting_sector_of_data = self.boot_sector['Starting Sector of Data']
+            # Keep cached blocks on cluster boundaries
+            self.device.align(self.starting_sector_of_data * self.bytes_per_sector)
 
             # Read FAT's info
-            # Move cursor in file to the 1st FAT
-            self.temp = self.bin_raw_data.read(self.bytes_per_sector * (self.sectors_in_boot_sectors - 1))
+            # The 1st FAT starts right after the reserved sectors
             FAT_size = self.bytes_per_sector * self.sectors_per_fats
 
             self.list_FAT: list[FAT] = []
-            for _ in range(self.numbers_of_fats):
-                self.list_FAT.append(FAT(self.bin_raw_data.read(FAT_size)))
+            for i in range(self.numbers_of_fats):
+                FAT_offset = self.bytes_per_sector * self.sectors_in_boot_sectors + i * FAT_size
+                self.list_FAT.append(FAT(self.device, FAT_offset, FAT_size, self.bytes_per_sector, self.stats))
 
             # Handle RDET
             starting_cluster_index = self.boot_sector["Starting Cluster of RDET"]
-            self.RDET = RDET(self.get_all_cluster_data(starting_cluster_index))
-            self.DET = {}
-            self.DET[starting_cluster_index] = self.RDET
+            root_data = self.get_all_cluster_data(starting_cluster_index)
+
+            self.RDET = RDET(root_data)
+            self.cwd_cluster = starting_cluster_index
+            self.DET = DirectoryCache(det_cache_bytes)
+            self.DET.pin(starting_cluster_index, self.RDET)
 
         except Exception as error:
             print(f"Error: {error}")
             exit()
 
+    def getStats(self) -> dict:
+        """Phase timers and I/O counters, plus directory and block cache statistics."""
+        stats = dict(self.stats.to_dict(), enabled=self.stats.enabled)
+        stats["directory cache"] = self.DET.stats()
+        if isinstance(self.device, CachedDevice):
+            stats["block cache"] = self.device.stats()
+        return stats
+
     def __str__(self) -> str:
         result = "---VOLUME INFORMATION---\n"
         result += "Volume name: " + self.volume_name + '\n'
@@ -220,10 +364,11 @@ class Fat32_Main:
         return result
 
     def __del__(self):
-        if getattr(self, "bin_raw_data", None):
+        if getattr(self, "device", None) is not None:
             print("Closing Volume...")
-            self.bin_raw_data.close()
+            self.device.close()
 
+    @timed("boot parse")
     def extract_boot_sector(self):
         self.boot_sector['Bytes Per Sector'] = int.from_bytes(self.boot_sector_data[0xB:0xD], 'little')
         self.boot_sector['Sectors Per Cluster'] = int.from_bytes(self.boot_sector_data[0xD:0xE], 'little')
@@ -240,23 +385,35 @@ class Fat32_Main:
         return self.sectors_in_boot_sectors + self.sectors_per_fats * self.numbers_of_fats + (
                     index - 2) * self.sectors_per_cluster
 
+    @timed("directory read")
     def get_all_cluster_data(self, cluster_index):
-        cluster_list = self.list_FAT[0].get_cluster_chain(cluster_index)
-        data = b""
-
-        for i in cluster_list:
-            sector_index = self.convert_cluster_to_sector_index(i)
-            self.bin_raw_data.seek(sector_index * self.bytes_per_sector)
-            data += self.bin_raw_data.read(self.bytes_per_sector * self.sectors_per_cluster)
+        return self.read_cluster_runs(self.list_FAT[0].get_cluster_runs(cluster_index))
+
+    def read_cluster_runs(self, runs):
+        cluster_size = self.bytes_per_sector * self.sectors_per_cluster
+        total = sum(count for _, count in runs) * cluster_size
+        if len(runs) == 1:
+            # Contiguous data needs no assembly; mapped images return a zero-copy view
+            return self.device.read_at(self.convert_cluster_to_sector_index(runs[0][0]) * self.bytes_per_sector, total)
+
+        data = bytearray(total)
+        view = memoryview(data)
+        pos = 0
+        for cluster, count in runs:
+            length = count * cluster_size
+            offset = self.convert_cluster_to_sector_index(cluster) * self.bytes_per_sector
+            self.device.readinto_at(offset, view[pos:pos + length])
+            pos += length
         return data
 
     @staticmethod
-    def isFAT32(volume_name):
+    def isFAT32(volume_name, device=None):
         try:
-            boot_sector = open(rf'\\.\{volume_name}', 'rb')
-            boot_sector.read(1)  # Ensure file pointer correctly point to boot sector
-            boot_sector.seek(0x52)
-            fat_type = boot_sector.read(8)
+            if device is None:
+                with open_device(volume_name, 'file') as boot_sector:
+                    fat_type = boot_sector.read_at(0x52, 8)
+            else:
+                fat_type = device.read_at(0x52, 8)
 
             if fat_type == b'FAT32   ':
                 return True
@@ -269,34 +426,44 @@ class Fat32_Main:
         dirs = re.sub(r"[/\\]+", r"\\", path).strip("\\").split("\\")
         return dirs
 
+    def get_det(self, start_cluster) -> RDET:
+        # ".." entries of first-level directories point at cluster 0
+        if start_cluster == 0:
+            start_cluster = self.boot_sector["Starting Cluster of RDET"]
+        cdet = self.DET.get(start_cluster)
+        if cdet is None:
+            cdet = RDET(self.get_all_cluster_data(start_cluster))
+            self.DET.put(start_cluster, cdet)
+        return cdet
+
+    @timed("path resolution")
     def visitDirectory(self, path) -> RDET:
+        return self.get_det(self.directory_cluster(path))
+
+    def directory_cluster(self, path) -> int:
+        # First cluster of the table of a directory, the root's for the volume itself
         if path == "":
             raise Exception("Require a directory!")
         path = self.parsePath(path)
+        root = self.boot_sector["Starting Cluster of RDET"]
 
         if path[0] == self.volume_name:
-            cdet = self.DET[self.boot_sector["Starting Cluster of RDET"]]
+            cluster = root
             path.pop(0)
         else:
-            cdet = self.RDET
+            cluster = self.cwd_cluster
 
         for dir in path:
-            entry = cdet.find_entry(dir)
+            entry = self.get_det(cluster).find_entry(dir)
             if entry is None:
-                raise Exception("Directory not found!")
+                raise FileNotFoundError("Directory not found!")
 
             if entry.is_directory():
-                if entry.start_cluster == 0:
-                    cdet = self.DET[self.boot_sector["Starting Cluster of RDET"]]
-                    continue
-                if entry.start_cluster in self.DET:
-                    cdet = self.DET[entry.start_cluster]
-                    continue
-                self.DET[entry.start_cluster] = RDET(self.get_all_cluster_data(entry.start_cluster))
-                cdet = self.DET[entry.start_cluster]
+                # ".." entries of first-level directories point at cluster 0
+                cluster = entry.start_cluster or root
             else:
                 raise Exception("Not a directory")
-        return cdet
+        return cluster
 
     def getCWD(self):
         if len(self.cwd) == 1:
@@ -314,28 +481,85 @@ class Fat32_Main:
 
             ret = []
             for entry in entry_list:
-                obj = {}
-                obj["Flags"] = entry.attr.value
-                obj["Date Modified"] = entry.date_updated
-                obj["Size"] = entry.size
-                obj["Name"] = entry.entry_name
-
-                if entry.start_cluster == 0:
-                    obj["Sector"] = (entry.start_cluster + 2) * self.sectors_per_cluster
-                else:
-                    obj["Sector"] = entry.start_cluster * self.sectors_per_cluster
-                ret.append(obj)
+                ret.append(self.entry_to_dict(entry))
             return ret
         except Exception as error:
             raise (error)
 
+    def entry_to_dict(self, entry: RDETentry) -> dict:
+        obj = {}
+        obj["Flags"] = entry.attr.value
+        obj["Date Created"] = entry.date_created
+        obj["Date Modified"] = entry.date_updated
+        obj["Size"] = entry.size
+        obj["Name"] = entry.entry_name
+
+        if entry.start_cluster == 0:
+            obj["Sector"] = (entry.start_cluster + 2) * self.sectors_per_cluster
+        else:
+            obj["Sector"] = entry.start_cluster * self.sectors_per_cluster
+        return obj
+
+    def walk(self, path="", hidden=False):
+        """Like os.walk: yield (dirpath, dirs, files) top-down without changing the current directory.
+
+        dirs and files hold getDirectory-style dicts; removing items from dirs
+        prunes the walk. System entries are left out unless hidden.
+        """
+        if path != "":
+            cluster = self.directory_cluster(path)
+            dirpath = "\\".join(self.parsePath(path))
+        else:
+            cluster = self.cwd_cluster
+            dirpath = self.getCWD().rstrip("\\")
+
+        # Tables are loaded when popped, so only the one being listed is held beyond the cache
+        root = self.boot_sector["Starting Cluster of RDET"]
+        visited = set()
+        stack = [(dirpath, cluster)]
+        while stack:
+            dirpath, cluster = stack.pop()
+            if cluster in visited:
+                continue
+            visited.add(cluster)
+            cdet = self.get_det(cluster)
+
+            subdirs = {}
+            dirs, files = [], []
+            for entry in (cdet.entries if hidden else cdet.get_active_entries()):
+                if entry.entry_name in (".", ".."):
+                    continue
+                if entry.is_directory():
+                    subdirs[entry.entry_name] = entry
+                    dirs.append(self.entry_to_dict(entry))
+                else:
+                    files.append(self.entry_to_dict(entry))
+            yield dirpath, dirs, files
+
+            for obj in reversed(dirs):
+                entry = subdirs[obj["Name"]]
+                stack.append((dirpath + "\\" + entry.entry_name, entry.start_cluster or root))
+
+    def scanCatalog(self, workers=1) -> FileCatalog:
+        """Catalog of the whole volume, read from every directory table."""
+        # Every entry, system ones too; find's filters decide what to show
+        return FileCatalog.fromWalk(self.volume_name, self.walk(self.volume_name, hidden=True))
+
+    def find(self, pattern=None, **filters) -> 'list[tuple[str, dict]]':
+        """Search the whole volume; see FileCatalog.find for the filters."""
+        if self.catalog is None:
+            # Built on the first search from every directory table, then reused
+            self.catalog = self.scanCatalog()
+        return [(path, self.catalog.toDict(row)) for path, row in self.catalog.find(pattern, **filters)]
+
     def changeDirectory(self, path=""):
         if path == "":
             raise Exception("Path to directory is required!")
 
         try:
-            cdet = self.visitDirectory(path)
-            self.RDET = cdet
+            cluster = self.directory_cluster(path)
+            self.RDET = self.get_det(cluster)
+            self.cwd_cluster = cluster
 
             dirs = self.parsePath(path)
             if dirs[0] == self.volume_name:
@@ -351,7 +575,8 @@ class Fat32_Main:
         except Exception as e:
             raise e
 
-    def getText(self, path: str) -> str:
+    @timed("path resolution")
+    def find_file(self, path: str) -> RDETentry:
         path_parts = self.parsePath(path)
 
         if len(path_parts) > 1:
@@ -366,24 +591,41 @@ class Fat32_Main:
             raise Exception("File doesn't exist")
         if entry.is_directory():
             raise Exception("Is a directory")
+        return entry
+
+    @timed("path resolution")
+    def stat(self, path: str) -> dict:
+        """entry_to_dict of a file or directory, looked up in its parent only."""
+        parts = self.parsePath(path)
+        if parts == [self.volume_name]:
+            # The root directory has no entry of its own
+            return {"Flags": 0x10, "Size": 0, "Name": self.volume_name}
+        parent = "\\".join(parts[:-1])
+        cdet = self.visitDirectory(parent) if parent else self.RDET
+        entry = cdet.find_entry(parts[-1])
+        if entry is None:
+            raise FileNotFoundError(path)
+        return self.entry_to_dict(entry)
+
+    def get_extents(self, entry: RDETentry) -> 'list[tuple[int, int]]':
+        if entry.size == 0:
+            return []
+        cluster_size = self.bytes_per_sector * self.sectors_per_cluster
+        return [(self.convert_cluster_to_sector_index(cluster) * self.bytes_per_sector, count * cluster_size)
+                for cluster, count in self.list_FAT[0].get_cluster_runs(entry.start_cluster)]
+
+    def open(self, path: str) -> ExtentStream:
+        entry = self.find_file(path)
+        return ExtentStream(self.device, self.get_extents(entry), entry.size, self.stats)
+
+    def readFiles(self, paths):
+        """Read whole files in on-disk order, yielding (path, data) as each one completes."""
+        files = []
+        for path in paths:
+            entry = self.find_file(path)
+            files.append((path, self.get_extents(entry), entry.size))
+        return read_batch(self.device, files)
 
-        index_list = self.list_FAT[0].get_cluster_chain(entry.start_cluster)
-        data = ""
-        size_left = entry.size
-
-        for i in index_list:
-            if size_left <= 0:
-                break
-
-            off = self.convert_cluster_to_sector_index(i)
-            self.bin_raw_data.seek(off * self.bytes_per_sector)
-            raw_data = self.bin_raw_data.read(min(self.sectors_per_cluster * self.bytes_per_sector, size_left))
-            size_left -= self.sectors_per_cluster * self.bytes_per_sector
-
-            try:
-                data += raw_data.decode()
-            except UnicodeDecodeError as e:
-                raise Exception("Not a text file, please use appropriate software to open.")
-            except Exception as e:
-                raise e
-        return data
+    def getText(self, path: str) -> str:
+        with self.open(path) as stream:
+            return "".join(iter_text(stream))
@@ -0,0 +1,105 @@
+import csv
+import hashlib
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Extract import WORKERS, collect
+from Stream import CHUNK_SIZE
+
+ALGORITHMS = ("md5", "sha256")
+
+
+def hash_stream(stream, algorithms=ALGORITHMS, chunk_size=CHUNK_SIZE) -> 'tuple[int, list[str]]':
+    # One reused buffer per call keeps memory flat whatever the file size
+    hashers = [hashlib.new(name) for name in algorithms]
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    size = 0
+    with stream:
+        while True:
+            count = stream.readinto(buffer)
+            if not count:
+                break
+            for hasher in hashers:
+                hasher.update(view[:count])
+            size += count
+    return size, [hasher.hexdigest() for hasher in hashers]
+
+
+def hash_path(volume, path: str, algorithms=ALGORITHMS) -> 'tuple[int, list[str]]':
+    return hash_stream(volume.open(path), algorithms)
+
+
+class Manifest:
+    """Writes one row per hashed file as CSV, or JSON lines when the path ends in .jsonl."""
+
+    def __init__(self, path: str, algorithms=ALGORITHMS) -> None:
+        self.fields = ["path", "size", "created", "modified", *algorithms]
+        self.jsonl = path.endswith(".jsonl")
+        self.fd = open(path, "w", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self.writer = csv.writer(self.fd)
+            self.writer.writerow(self.fields)
+
+    def write(self, path: str, obj: dict, size: int, digests: 'list[str]'):
+        # FAT32 creation dates are optional and may be None
+        created = obj["Date Created"].isoformat() if obj["Date Created"] is not None else None
+        row = [path, size, created, obj["Date Modified"].isoformat(), *digests]
+        if self.jsonl:
+            self.fd.write(json.dumps(dict(zip(self.fields, row))) + "\n")
+        else:
+            self.writer.writerow(row)
+
+    def close(self):
+        self.fd.close()
+
+
+def hash_files(volume, src: str, manifest: str = None, algorithms=ALGORITHMS, workers=WORKERS,
+               callback=None) -> dict:
+    """Hash every file under src of a volume with a thread pool.
+
+    hashlib releases the GIL on large updates, so the workers run in parallel.
+    Each finished file is written to the manifest, if given, and passed to
+    callback(path, obj, size, digests).
+    """
+    start = time.perf_counter()
+    stats = {"files": 0, "bytes": 0, "failed": 0, "seconds": 0.0, "MB/s": 0.0, "files/s": 0.0}
+    output = Manifest(manifest, algorithms) if manifest is not None else None
+
+    def finish(job):
+        path, obj, future = job
+        try:
+            size, digests = future.result()
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"[ERROR] {path}: {e}")
+            return
+        stats["files"] += 1
+        stats["bytes"] += size
+        if output is not None:
+            output.write(path, obj, size, digests)
+        if callback is not None:
+            callback(path, obj, size, digests)
+
+    jobs = collect(volume, src)
+    jobs.sort(key=lambda job: job[2]["Sector"])
+
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, _, obj in jobs:
+                pending.append((path, obj, pool.submit(hash_path, volume, path, algorithms)))
+                if len(pending) >= workers * 2:
+                    finish(pending.popleft())
+            while pending:
+                finish(pending.popleft())
+    finally:
+        if output is not None:
+            output.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    if stats["seconds"] > 0:
+        stats["MB/s"] = stats["bytes"] / stats["seconds"] / (1024 * 1024)
+        stats["files/s"] = stats["files"] / stats["seconds"]
+    return stats
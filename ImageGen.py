@@ -0,0 +1,451 @@
+"""Synthetic FAT32 and NTFS images for benchmarks.
+
+Both generators lay out a directory tree `depth` levels deep with `fanout`
+subdirectories per directory, spread `files` files over it round-robin and
+return a manifest mapping every file path (relative to the root,
+backslash separated) to its content. With frag > 0, file data is split
+into runs of that many clusters that are not stored in order.
+"""
+import random
+import struct
+import time
+
+FILE_TIME = 1700000000
+NT_EPOCH = 116444736000000000
+
+
+def layout(files, depth, fanout):
+    # Directory paths as tuples, parents before children, and the file names of each
+    dirs = [()]
+    stack = [()]
+    while stack:
+        parent = stack.pop()
+        if len(parent) >= depth:
+            continue
+        for i in range(fanout):
+            path = parent + (f"dir_{len(parent)}_{i}",)
+            dirs.append(path)
+            stack.append(path)
+    dirs.sort(key=lambda path: (len(path), path))
+    names = {path: [] for path in dirs}
+    for i in range(files):
+        names[dirs[i % len(dirs)]].append(f"file_{i:05d}.txt")
+    return dirs, names
+
+
+def subdirs(dirs, parent):
+    return [path for path in dirs if len(path) == len(parent) + 1 and path[:-1] == parent]
+
+
+def file_body(key, size):
+    lines = "".join(f"{key} line {k}\n" for k in range(size // 16 + 1))
+    return lines.encode()[:size]
+
+
+# ---------------------------------------------------------------- FAT32
+
+def fat_date(t):
+    lt = time.localtime(t)
+    date = ((lt.tm_year - 1980) << 9) | (lt.tm_mon << 5) | lt.tm_mday
+    clock = (lt.tm_hour << 11) | (lt.tm_min << 5) | (lt.tm_sec // 2)
+    return date, clock
+
+
+def lfn_checksum(short):
+    total = 0
+    for c in short:
+        total = (((total & 1) << 7) + (total >> 1) + c) & 0xFF
+    return total
+
+
+def dir_entries(name, short, attr, cluster, size, t=FILE_TIME):
+    # Long-name slots (last one first) followed by the 8.3 entry
+    date, clock = fat_date(t)
+    out = b''
+    if name is not None:
+        checksum = lfn_checksum(short)
+        encoded = name.encode('utf-16le')
+        chars = [encoded[i:i + 2] for i in range(0, len(encoded), 2)]
+        count = (len(chars) + 12) // 13
+        if len(chars) % 13:
+            chars.append(b'\x00\x00')
+        chars += [b'\xff\xff'] * (count * 13 - len(chars))
+        for seq in range(count, 0, -1):
+            part = chars[(seq - 1) * 13:seq * 13]
+            order = seq | (0x40 if seq == count else 0)
+            out += (bytes([order]) + b''.join(part[:5]) + bytes([0x0F, 0, checksum]) + b''.join(part[5:11])
+                    + b'\0\0' + b''.join(part[11:13]))
+    return out + struct.pack('<11sBBBHHHHHHHI', short, attr, 0, 0, clock, date, date, cluster >> 16,
+                             clock, date, cluster & 0xFFFF, size)
+
+
+def make_fat32(path, size_mb=64, files=200, depth=3, fanout=3, file_kb=8, frag=0, spc=8, seed=1):
+    rnd = random.Random(seed)
+    bps = 512
+    total = size_mb * 1024 * 1024 // bps
+    reserved = 32
+    spf = (total // spc * 4 + bps - 1) // bps
+    data_start = reserved + 2 * spf
+    clusters = (total - data_start) // spc
+    cluster_size = bps * spc
+    fat = [0] * (clusters + 2)
+    fat[0], fat[1] = 0x0FFFFFF8, 0x0FFFFFFF
+
+    next_free = 2
+    pieces = []
+    if frag:
+        # Carve the start of the data area into shuffled pieces of frag clusters
+        pool = list(range(2, 2 + min(clusters, files * (file_kb * 1024 // cluster_size + 2) * 2)))
+        next_free = 2 + len(pool)
+        pieces = [pool[i:i + frag] for i in range(0, len(pool), frag)]
+        rnd.shuffle(pieces)
+
+    def alloc(count):
+        # Every chain gets at least one cluster; unused clusters of a piece go back to the pool
+        nonlocal next_free
+        count = max(count, 1)
+        chain = []
+        while len(chain) < count:
+            if pieces:
+                chain.extend(pieces.pop(rnd.randrange(len(pieces))))
+                continue
+            if next_free >= clusters + 2:
+                raise Exception("Image full")
+            chain.append(next_free)
+            next_free += 1
+        if len(chain) > count:
+            pieces.append(chain[count:])
+            chain = chain[:count]
+        for a, b in zip(chain, chain[1:]):
+            fat[a] = b
+        fat[chain[-1]] = 0x0FFFFFFF
+        return chain
+
+    dirs, names = layout(files, depth, fanout)
+    manifest = {}
+    with open(path, 'wb') as fd:
+        fd.truncate(total * bps)
+
+        def write_chain(chain, data):
+            for i, cluster in enumerate(chain):
+                fd.seek((data_start + (cluster - 2) * spc) * bps)
+                fd.write(data[i * cluster_size:(i + 1) * cluster_size])
+
+        # Directory clusters first, sized for their entries (long names take ~3 slots)
+        chains = {}
+        for directory in dirs:
+            slots = 2 + len(subdirs(dirs, directory)) + len(names[directory])
+            chains[directory] = alloc((slots * 96 + cluster_size - 1) // cluster_size + 1)
+
+        for directory in dirs:
+            if directory:
+                parent = chains[directory[:-1]][0] if len(directory) > 1 else 0
+                table = dir_entries(None, b'.          ', 0x10, chains[directory][0], 0)
+                table += dir_entries(None, b'..         ', 0x10, parent, 0)
+            else:
+                table = struct.pack('<11sB20x', b'BENCHVOL   ', 0x08)
+            number = 0
+            for child in subdirs(dirs, directory):
+                number += 1
+                table += dir_entries(child[-1], b'D%06d    ' % number, 0x10, chains[child][0], 0)
+            for name in names[directory]:
+                number += 1
+                key = '\\'.join(directory + (name,))
+                body = file_body(key, file_kb * 1024)
+                chain = alloc((len(body) + cluster_size - 1) // cluster_size)
+                write_chain(chain, body)
+                manifest[key] = body
+                table += dir_entries(name, b'F%06dTXT' % number, 0x20, chain[0], len(body))
+            write_chain(chains[directory], table)
+
+        boot = bytearray(512)
+        boot[0:3] = b'\xEB\x58\x90'
+        boot[3:11] = b'MSWIN4.1'
+        struct.pack_into('<HBHBHHBHHHII', boot, 0x0B, bps, spc, reserved, 2, 0, 0, 0xF8, 0, 63, 255, 0, total)
+        struct.pack_into('<IHHIHH', boot, 0x24, spf, 0, 0, chains[()][0], 1, 6)
+        struct.pack_into('<BBBI11s8s', boot, 0x40, 0x80, 0, 0x29, 0x1234ABCD, b'BENCHVOL   ', b'FAT32   ')
+        boot[510:512] = b'\x55\xAA'
+        fd.seek(0)
+        fd.write(boot)
+        table = struct.pack(f'<{len(fat)}I', *fat)
+        for copy in range(2):
+            fd.seek((reserved + copy * spf) * bps)
+            fd.write(table)
+    return manifest
+
+
+# ---------------------------------------------------------------- NTFS
+
+def nt_time(t):
+    return int(t * 10000000) + NT_EPOCH
+
+
+def apply_fixup(buf, usa_offset, usn=1):
+    # Move the last two bytes of every sector into the update sequence array
+    struct.pack_into('<H', buf, usa_offset, usn)
+    for i in range(len(buf) // 512):
+        end = (i + 1) * 512 - 2
+        buf[usa_offset + 2 + 2 * i:usa_offset + 4 + 2 * i] = buf[end:end + 2]
+        struct.pack_into('<H', buf, end, usn)
+
+
+def encode_runs(runs):
+    out = b''
+    previous = 0
+    for lcn, length in runs:
+        length = length.to_bytes(8, 'little').rstrip(b'\0') or b'\0'
+        if lcn is None:
+            out += bytes([len(length)]) + length
+            continue
+        delta = lcn - previous
+        size = 1
+        while not -(1 << (8 * size - 1)) <= delta < (1 << (8 * size - 1)):
+            size += 1
+        out += bytes([(size << 4) | len(length)]) + length + delta.to_bytes(size, 'little', signed=True)
+        previous = lcn
+    return out + b'\0'
+
+
+def attr_resident(atype, content, name='', aid=0):
+    encoded = name.encode('utf-16le')
+    offset = (0x18 + len(encoded) + 7) & ~7
+    length = (offset + len(content) + 7) & ~7
+    attr = bytearray(length)
+    struct.pack_into('<IIBBHHHIH', attr, 0, atype, length, 0, len(name), 0x18, 0, aid, len(content), offset)
+    attr[0x18:0x18 + len(encoded)] = encoded
+    attr[offset:offset + len(content)] = content
+    return bytes(attr)
+
+
+def attr_nonresident(atype, runs, size, cluster_size, name='', aid=0):
+    encoded = name.encode('utf-16le')
+    offset = (0x40 + len(encoded) + 7) & ~7
+    packed = encode_runs(runs)
+    length = (offset + len(packed) + 7) & ~7
+    count = sum(length for _, length in runs)
+    attr = bytearray(length)
+    struct.pack_into('<IIBBHHH', attr, 0, atype, length, 1, len(name), 0x40, 0, aid)
+    struct.pack_into('<QQHHIQQQ', attr, 0x10, 0, count - 1, offset, 0, 0, count * cluster_size, size, size)
+    attr[0x40:0x40 + len(encoded)] = encoded
+    attr[offset:offset + len(packed)] = packed
+    return bytes(attr)
+
+
+def si_content(flags, t=FILE_TIME):
+    return struct.pack('<QQQQI', nt_time(t), nt_time(t), nt_time(t), nt_time(t), flags) + b'\0' * 0x24
+
+
+def fn_content(parent, name, size, flags, t=FILE_TIME, namespace=1):
+    return struct.pack('<QQQQQQQIIBB', parent | (1 << 48), nt_time(t), nt_time(t), nt_time(t), nt_time(t),
+                       (size + 4095) & ~4095, size, flags, 0, len(name), namespace) + name.encode('utf-16le')
+
+
+def index_entry(ref, fn, last=False, vcn=None):
+    flags = (1 if vcn is not None else 0) | (2 if last else 0)
+    stream = b'' if last else fn
+    length = (0x10 + len(stream) + 7) & ~7
+    if vcn is not None:
+        length += 8
+    entry = bytearray(length)
+    struct.pack_into('<QHHI', entry, 0, 0 if last else ref | (1 << 48), length, len(stream), flags)
+    entry[0x10:0x10 + len(stream)] = stream
+    if vcn is not None:
+        struct.pack_into('<Q', entry, length - 8, vcn)
+    return bytes(entry)
+
+
+def with_vcn(entry, vcn):
+    entry = bytearray(entry)
+    struct.pack_into('<I', entry, 12, struct.unpack_from('<I', entry, 12)[0] | 1)
+    struct.pack_into('<H', entry, 8, len(entry) + 8)
+    return bytes(entry) + struct.pack('<Q', vcn)
+
+
+def build_index(entries, limit=4096 - 0x60, root_limit=500):
+    """Turn sorted index entries into a B+tree of INDX blocks.
+
+    Returns the root entries and the blocks as (entries, last child VCN);
+    no blocks means everything fits in $INDEX_ROOT.
+    """
+    blocks = []
+    level, children = entries, None
+    while sum(len(e) + (8 if children is not None else 0) for e in level) + 0x40 >= root_limit:
+        nodes, separators, current = [], [], []
+        for k, entry in enumerate(level):
+            if children is not None:
+                entry = with_vcn(entry, children[k])
+            if sum(len(e) for e in current) + len(entry) > limit:
+                # This entry moves up a level, splitting the node
+                nodes.append((current, children[k] if children is not None else None))
+                separators.append(level[k])
+                current = []
+                continue
+            current.append(entry)
+        nodes.append((current, children[-1] if children is not None else None))
+        vcns = []
+        for node in nodes:
+            vcns.append(len(blocks))
+            blocks.append(node)
+        level, children = separators, vcns
+
+    if children is None:
+        root = level + [index_entry(0, b'', last=True)]
+    else:
+        root = [with_vcn(e, children[k]) for k, e in enumerate(level)]
+        root.append(index_entry(0, b'', last=True, vcn=children[-1]))
+    return root, blocks
+
+
+def make_ntfs(path, size_mb=64, files=200, depth=3, fanout=3, file_kb=8, frag=0, resident_every=5,
+              sparse_every=0, seed=1):
+    bps, spc = 512, 8
+    cluster_size = bps * spc
+    record_size = 1024
+    total = size_mb * 1024 * 1024 // bps
+    clusters = total // spc
+
+    dirs, names = layout(files, depth, fanout)
+    ids = {(): 5}
+    for directory in dirs[1:]:
+        ids[directory] = 16 + len(ids) - 1
+    for directory in dirs:
+        for name in names[directory]:
+            ids[directory + (name,)] = 16 + len(ids) - 1
+
+    mft_lcn = 4
+    mft_clusters = ((16 + len(ids)) * record_size + cluster_size - 1) // cluster_size + 1
+    next_free = mft_lcn + mft_clusters
+
+    def alloc(count):
+        # frag leaves a one-cluster gap after every run so runs never merge
+        nonlocal next_free
+        runs = []
+        while count > 0:
+            take = min(count, frag) if frag else count
+            runs.append((next_free, take))
+            next_free += take + (1 if frag else 0)
+            count -= take
+        if next_free >= clusters:
+            raise Exception("Image full")
+        return runs
+
+    records = {}
+    manifest = {}
+
+    def record(number, attrs, flags):
+        buf = bytearray(record_size)
+        struct.pack_into('<4sHHQHHHHII', buf, 0, b'FILE', 0x30, 3, 0, 1, 1, 0x38, flags, 0, record_size)
+        struct.pack_into('<I', buf, 0x2C, number)
+        pos = 0x38
+        for attr in attrs:
+            buf[pos:pos + len(attr)] = attr
+            pos += len(attr)
+        if pos + 8 > record_size - 2:
+            raise Exception("Record overflow")
+        struct.pack_into('<I', buf, pos, 0xFFFFFFFF)
+        struct.pack_into('<I', buf, 0x18, pos + 8)
+        apply_fixup(buf, 0x30)
+        records[number] = buf
+
+    system = ['$MFT', '$MFTMirr', '$LogFile', '$Volume', '$AttrDef', '.', '$Bitmap', '$Boot', '$BadClus',
+              '$Secure', '$UpCase', '$Extend']
+    with open(path, 'wb') as fd:
+        fd.truncate(total * bps)
+
+        def write_runs(runs, data):
+            pos = 0
+            for lcn, length in runs:
+                if lcn is not None:
+                    fd.seek(lcn * cluster_size)
+                    fd.write(data[pos:pos + length * cluster_size])
+                pos += length * cluster_size
+
+        for directory in dirs:
+            for name in names[directory]:
+                number = ids[directory + (name,)]
+                key = '\\'.join(directory + (name,))
+                if (resident_every and number % resident_every == 0) or not file_kb:
+                    body = f"{key} resident\n".encode()
+                    data = attr_resident(0x80, body, aid=2)
+                else:
+                    body = file_body(key, file_kb * 1024)
+                    count = (len(body) + cluster_size - 1) // cluster_size
+                    if sparse_every and number % sparse_every == 0 and count >= 3:
+                        # One sparse cluster after the first
+                        body = body[:cluster_size] + bytes(cluster_size) + body[2 * cluster_size:]
+                        runs = alloc(1) + [(None, 1)] + alloc(count - 2)
+                    else:
+                        runs = alloc(count)
+                    write_runs(runs, body)
+                    data = attr_nonresident(0x80, runs, len(body), cluster_size, aid=2)
+                manifest[key] = body
+                record(number, [attr_resident(0x10, si_content(0x20)),
+                                attr_resident(0x30, fn_content(ids[directory], name, len(body), 0x20), aid=1),
+                                data], 1)
+
+        for directory in dirs:
+            number = ids[directory]
+            children = [(child[-1], ids[child], 0, 0x10000000) for child in subdirs(dirs, directory)]
+            children += [(name, ids[directory + (name,)], len(manifest['\\'.join(directory + (name,))]), 0x20)
+                         for name in names[directory]]
+            if not directory:
+                children += [(name, i, 0, 0x06) for i, name in enumerate(system) if i != 5]
+            children.sort(key=lambda child: child[0].upper())
+            entries = [index_entry(child[1], fn_content(number, child[0], child[2], child[3])) for child in children]
+            root, blocks = build_index(entries)
+
+            header = struct.pack('<IIIB3x', 0x30, 1, 4096, 1)
+            body = b''.join(root)
+            root_content = header + struct.pack('<IIIB3x', 0x10, 0x10 + len(body), 0x10 + len(body),
+                                                1 if blocks else 0) + body
+            parent = ids[directory[:-1]] if directory else 5
+            attrs = [attr_resident(0x10, si_content(0x10 if directory else 0x06)),
+                     attr_resident(0x30, fn_content(parent, directory[-1] if directory else '.', 0, 0x10000000),
+                                   aid=1),
+                     attr_resident(0x90, root_content, '$I30', aid=3)]
+            if blocks:
+                runs = alloc(len(blocks))
+                buf = bytearray()
+                for vcn, (node, last_child) in enumerate(blocks):
+                    block = bytearray(4096)
+                    body = b''.join(node + [index_entry(0, b'', last=True, vcn=last_child)])
+                    struct.pack_into('<4sHHQQ', block, 0, b'INDX', 0x28, 9, 0, vcn)
+                    struct.pack_into('<IIIB3x', block, 0x18, 0x28, 0x28 + len(body), 4096 - 0x18,
+                                     1 if last_child is not None else 0)
+                    block[0x40:0x40 + len(body)] = body
+                    apply_fixup(block, 0x28)
+                    buf += block
+                write_runs(runs, bytes(buf))
+                bitmap = ((1 << len(blocks)) - 1).to_bytes((len(blocks) + 7) // 8, 'little')
+                attrs.append(attr_nonresident(0xA0, runs, len(blocks) * 4096, cluster_size, '$I30', aid=4))
+                attrs.append(attr_resident(0xB0, bitmap + bytes(-len(bitmap) % 8), '$I30', aid=5))
+            record(number, attrs, 3)
+
+        for i, name in enumerate(system):
+            if i == 5:
+                continue
+            if i == 0:
+                data = attr_nonresident(0x80, [(mft_lcn, mft_clusters)], mft_clusters * cluster_size, cluster_size,
+                                        aid=2)
+            else:
+                data = attr_resident(0x80, b'', aid=2)
+            record(i, [attr_resident(0x10, si_content(0x06)), attr_resident(0x30, fn_content(5, name, 0, 0x06), aid=1),
+                       data], 1)
+
+        mft = bytearray(mft_clusters * cluster_size)
+        for number, buf in records.items():
+            mft[number * record_size:(number + 1) * record_size] = buf
+        fd.seek(mft_lcn * cluster_size)
+        fd.write(mft)
+
+        boot = bytearray(512)
+        boot[0:3] = b'\xEB\x52\x90'
+        boot[3:11] = b'NTFS    '
+        struct.pack_into('<HBH', boot, 0x0B, bps, spc, 0)
+        boot[0x15] = 0xF8
+        struct.pack_into('<QQQb3xb3xQ', boot, 0x28, total - 1, mft_lcn, mft_lcn + mft_clusters, -10, 1,
+                         0x1234567890ABCDEF)
+        boot[510:512] = b'\x55\xAA'
+        fd.seek(0)
+        fd.write(boot)
+    return manifest
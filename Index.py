@@ -0,0 +1,100 @@
+import hashlib
+import sqlite3
+from array import array
+
+SCHEMA_VERSION = 2
+
+
+def digest(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def pack_runs(runs) -> bytes:
+    # (LCN, count) pairs as int64s, -1 standing for a sparse run
+    values = array('q')
+    for lcn, count in runs:
+        values.append(-1 if lcn is None else lcn)
+        values.append(count)
+    return values.tobytes()
+
+
+def unpack_runs(blob) -> 'list[tuple[int, int]]':
+    values = array('q')
+    values.frombytes(blob)
+    return [(None if values[i] == -1 else values[i], values[i + 1]) for i in range(0, len(values), 2)]
+
+
+class MetadataIndex:
+    """SQLite sidecar holding the parsed $MFT records of one NTFS volume.
+
+    The index is only trusted while its key matches the volume: serial
+    number and boot-sector hash. Any mismatch empties it so the caller
+    rebuilds from disk; the chunk digests let it spot the records that
+    changed since it was written. The key is written with the records of
+    a full scan, so a scan cut short leaves the index invalid.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # A cache that can always be rebuilt does not need durable commits
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY, parent INTEGER, name TEXT, flags INTEGER,
+                created INTEGER, modified INTEGER, size INTEGER, residence INTEGER,
+                content BLOB, runs BLOB);
+            CREATE TABLE IF NOT EXISTS chunks (offset INTEGER PRIMARY KEY, digest TEXT);
+        ''')
+        self.key = None
+        self.valid = False
+
+    def open(self, key: dict) -> bool:
+        """Check the stored key against the volume; reset the index when it differs."""
+        self.key = dict(key, schema=str(SCHEMA_VERSION))
+        stored = dict(self.db.execute('SELECT key, value FROM meta'))
+        self.valid = stored == self.key
+        if not self.valid:
+            with self.db:
+                for table in ('meta', 'records', 'chunks'):
+                    self.db.execute(f'DELETE FROM {table}')
+        return self.valid
+
+    def load_records(self) -> 'list[tuple]':
+        rows = []
+        for row in self.db.execute('SELECT * FROM records'):
+            residence = None if row[7] is None else bool(row[7])
+            rows.append(row[:7] + (residence, row[8], unpack_runs(row[9])))
+        return rows
+
+    def save(self, records, chunks: 'dict[int, str]'):
+        """Store the records and chunk digests of a full scan along with the key opened."""
+        with self.db:
+            for table in ('meta', 'records', 'chunks'):
+                self.db.execute(f'DELETE FROM {table}')
+            self.db.executemany('INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                record[:7] + (None if record[7] is None else int(record[7]), record[8], pack_runs(record[9]))
+                for record in records))
+            self.db.executemany('INSERT INTO chunks VALUES (?, ?)', chunks.items())
+            self.db.executemany('INSERT INTO meta VALUES (?, ?)', self.key.items())
+        self.valid = True
+
+    def update_records(self, removed, records):
+        """Delete the record numbers in removed, then insert or replace records."""
+        with self.db:
+            self.db.executemany('DELETE FROM records WHERE id = ?', ((fileID,) for fileID in removed))
+            self.db.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                record[:7] + (None if record[7] is None else int(record[7]), record[8], pack_runs(record[9]))
+                for record in records))
+
+    def load_chunks(self) -> 'dict[int, str]':
+        return dict(self.db.execute('SELECT offset, digest FROM chunks'))
+
+    def save_chunks(self, chunks: 'dict[int, str]'):
+        with self.db:
+            self.db.execute('DELETE FROM chunks')
+            self.db.executemany('INSERT INTO chunks VALUES (?, ?)', chunks.items())
+
+    def close(self):
+        self.db.close()
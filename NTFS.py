@@ -1,6 +1,42 @@
 import re
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from codecs import utf_16_le_decode
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Flag, auto
 from datetime import datetime
+from Catalog import FileCatalog
+from Device import CachedDevice, MemoryDevice, open_device
+from Index import MetadataIndex, digest
+from Stats import NULL_STATS, timed
+from Stream import ExtentStream, iter_text, read_batch
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MFT_CHUNK_SIZE = 4 * 1024 * 1024
+# Update sequence fixups protect every 512 bytes of a record or index block, whatever the sector size
+NTFS_BLOCK_SIZE = 512
+
+# Little-endian layouts of the on-disk structures the record parser reads
+RECORD_HEADER = struct.Struct('<4sHHQHHHHIIQHHI')
+USA_HEADER = struct.Struct('<HH')
+ATTRIBUTE_HEADER = struct.Struct('<IIBBHHHIH')
+NONRESIDENT_HEADER = struct.Struct('<QQH')
+QWORD = struct.Struct('<Q')
+STANDARD_INFORMATION = struct.Struct('<QQ16xI')
+FILE_NAME = struct.Struct('<Q56xBB')
+ATTRIBUTE_LIST_ENTRY = struct.Struct('<IHBBQQH')
+REFERENCE_MASK = 0xFFFFFFFFFFFF
+FILE_SIGNATURE = int.from_bytes(b"FILE", byteorder='little')
+
+# Lower ranks win: Win32 and Win32 & DOS names, then POSIX, then the DOS 8.3 alias
+NAME_RANK = {1: 0, 3: 0, 0: 1, 2: 2}
 
 
 class Attribute(Flag):
@@ -12,65 +48,299 @@ class Attribute(Flag):
     ARCHIVE = auto()
 
 
+ATTRIBUTE_MASK = 0x3F
+ATTRIBUTE_FLAGS = tuple(Attribute(value) for value in range(ATTRIBUTE_MASK + 1))
+
+
+def filetimeToUnix(timestamp):
+    # FILETIME counts 100 ns intervals since 1601-01-01
+    return (timestamp - 116444736000000000) // 10000000
+
+
 def getDatetime(timestamp):
-    return datetime.fromtimestamp((timestamp - 116444736000000000) // 10000000)
+    return datetime.fromtimestamp(filetimeToUnix(timestamp))
+
+
+def fixupInPlace(buf, start, size):
+    # Restore the last two bytes of every 512-byte block of buf[start:start + size] from its
+    # update sequence array, all blocks at once through extended slices
+    usaOffset, usaCount = USA_HEADER.unpack_from(buf, start + 4)
+    count = min(usaCount - 1, size // NTFS_BLOCK_SIZE)
+    if count <= 0:
+        return
+    usa = start + usaOffset
+    first = start + NTFS_BLOCK_SIZE - 2
+    end = start + count * NTFS_BLOCK_SIZE
+    if (buf[first:end:NTFS_BLOCK_SIZE] != buf[usa:usa + 1] * count or
+            buf[first + 1:end:NTFS_BLOCK_SIZE] != buf[usa + 1:usa + 2] * count):
+        raise Exception("Torn multi-sector record")
+    buf[first:end:NTFS_BLOCK_SIZE] = buf[usa + 2:usa + 2 * count + 2:2]
+    buf[first + 1:end:NTFS_BLOCK_SIZE] = buf[usa + 3:usa + 2 * count + 3:2]
+
+
+def applyFixup(data):
+    buf = bytearray(data)
+    fixupInPlace(buf, 0, len(buf))
+    return buf
+
+
+def iterAttributes(raw):
+    # Yield (type, start, length) for every attribute of a FILE record
+    start = int.from_bytes(raw[0x14:0x16], byteorder='little')
+    while start + 8 <= len(raw):
+        attrType = int.from_bytes(raw[start:start + 4], byteorder='little')
+        if attrType == 0xFFFFFFFF:
+            return
+        length = int.from_bytes(raw[start + 4:start + 8], byteorder='little')
+        if length == 0 or start + length > len(raw):
+            return
+        yield attrType, start, length
+        start += length
+
+
+def getAttributeName(raw, start):
+    nameLength = raw[start + 9]
+    nameOffset = int.from_bytes(raw[start + 0xA:start + 0xC], byteorder='little')
+    return bytes(raw[start + nameOffset:start + nameOffset + nameLength * 2]).decode('utf-16le')
+
+
+def getResidentContent(raw, start):
+    size = int.from_bytes(raw[start + 0x10:start + 0x14], byteorder='little')
+    offset = int.from_bytes(raw[start + 0x14:start + 0x16], byteorder='little')
+    return raw[start + offset:start + offset + size]
+
+
+def parseDataRuns(raw, start=0):
+    # Decode a run list into (LCN, cluster count) pairs, LCN None for sparse runs
+    runs = []
+    lcn = 0
+    while start < len(raw) and raw[start] != 0:
+        header = raw[start]
+        lengthSize = header & 0x0F
+        offsetSize = (header & 0xF0) >> 4
+        start += 1
+        count = int.from_bytes(raw[start:start + lengthSize], byteorder='little')
+        start += lengthSize
+        if offsetSize == 0:
+            runs.append((None, count))
+        else:
+            lcn += int.from_bytes(raw[start:start + offsetSize], byteorder='little', signed=True)
+            runs.append((lcn, count))
+        start += offsetSize
+    return runs
+
+
+def parseIndexEntries(raw, nodeStart):
+    # Yield (record number, namespace) for every entry of an index node
+    entriesStart = nodeStart + int.from_bytes(raw[nodeStart:nodeStart + 4], byteorder='little')
+    entriesEnd = nodeStart + int.from_bytes(raw[nodeStart + 4:nodeStart + 8], byteorder='little')
+    start = entriesStart
+    while start + 0x10 <= min(entriesEnd, len(raw)):
+        length = int.from_bytes(raw[start + 8:start + 0xA], byteorder='little')
+        streamLength = int.from_bytes(raw[start + 0xA:start + 0xC], byteorder='little')
+        flags = int.from_bytes(raw[start + 0xC:start + 0x10], byteorder='little')
+        if flags & 2 or length == 0:
+            return
+        if streamLength >= 0x42:
+            recordNumber = int.from_bytes(raw[start:start + 6], byteorder='little')
+            yield recordNumber, raw[start + 0x10 + 0x41]
+        start += length
+
+
+class ExtensionsNeeded(Exception):
+    """A base record whose $ATTRIBUTE_LIST puts attributes in other records.
+
+    references lists those records when the list is resident; otherwise the
+    list itself has to be read from runs first.
+    """
+
+    def __init__(self, references=(), runs=(), size=0) -> None:
+        super().__init__("Attributes stored in extension records")
+        self.references = list(references)
+        self.runs = list(runs)
+        self.size = size
+
+
+def listReferences(data, fileID: int) -> 'list[int]':
+    # Records named by the entries of an $ATTRIBUTE_LIST, other than the base record itself
+    references = []
+    start = 0
+    while start + ATTRIBUTE_LIST_ENTRY.size <= len(data):
+        _, length, _, _, _, reference, _ = ATTRIBUTE_LIST_ENTRY.unpack_from(data, start)
+        if length == 0:
+            break
+        reference &= REFERENCE_MASK
+        if reference != fileID and reference not in references:
+            references.append(reference)
+        start += length
+    return references
 
 
 class MFTRecord:
-    def __init__(self, data) -> None:
-        self.raw = data
-        self.fileID = int.from_bytes(self.raw[0x2C:0x30], byteorder='little')
-        self.flag = self.raw[0x16]
-
-        if self.flag == 0 or self.flag == 2:
-            # Deleted record
-            raise Exception("Skip this record")
-
-        infoStart = int.from_bytes(self.raw[0x14:0x16], byteorder='little')
-        infoSize = int.from_bytes(self.raw[infoStart + 4:infoStart + 8], byteorder='little')
-
-        self.info = {}
-        self.parseInfo(infoStart)
-        fileNameStart = infoStart + infoSize
-        fileNameSize = int.from_bytes(self.raw[fileNameStart + 4:fileNameStart + 8], byteorder='little')
-
-        self.fileName = {}
-        self.parseFileName(fileNameStart)
-        dataStart = fileNameStart + fileNameSize
-        dataSignature = self.raw[dataStart:dataStart + 4]
-
-        if dataSignature[0] == 64:
-            dataStart += int.from_bytes(self.raw[dataStart + 4:dataStart + 8], byteorder='little')
-        dataSignature = self.raw[dataStart:dataStart + 4]
-
-        self.data = {}
-        if dataSignature[0] == 128:
-            self.parseData(dataStart)
-
-        elif dataSignature[0] == 144:
-            self.info['flags'] |= Attribute.DIRECTORY
-            self.data['size'] = 0
-            self.data['residence'] = True
-        self.childs: list[MFTRecord] = []
-        del self.raw
+    # Millions of these stay resident, so no per-instance __dict__ and raw timestamps
+    __slots__ = ('fileID', 'flag', 'parentID', 'longName', 'flags', 'createdRaw', 'modifiedRaw',
+                 'size', 'residence', 'content', 'runs', '_childs', 'childLoader',
+                 'nameIndex')
+
+    def __init__(self, data, extensions=()) -> None:
+        """Parse a fixed-up FILE record in a single pass over its attributes.
+
+        Attributes are dispatched on type wherever they sit, in the record
+        and then in extensions, the records its $ATTRIBUTE_LIST points at.
+        Of several $FILE_NAME attributes the Win32 one wins over POSIX and
+        the DOS 8.3 alias; only the unnamed $DATA stream is kept.
+        """
+        (_, _, _, _, _, _, attrOffset, self.flag, _, _, baseReference, _, _,
+         self.fileID) = RECORD_HEADER.unpack_from(data)
+        if not self.flag & 1:
+            raise Exception("Record not in use")
+        if baseReference & REFERENCE_MASK:
+            raise Exception("Extension record")
+
+        info = None
+        nameRank = None
+        size = 0
+        residence = None
+        content = None
+        pieces = []
+        for raw in (data, *extensions):
+            start = attrOffset if raw is data else RECORD_HEADER.unpack_from(raw)[6]
+            end = len(raw)
+            while start + 0x18 <= end:
+                (attrType, length, nonResident, nameLength, _, _, _,
+                 contentSize, contentOffset) = ATTRIBUTE_HEADER.unpack_from(raw, start)
+                if attrType == 0xFFFFFFFF:
+                    break
+                if length < 0x18 or start + length > end:
+                    raise Exception(f"Attribute 0x{attrType:X} overruns the record")
+
+                if attrType == 0x80:
+                    # Named $DATA attributes are alternate streams
+                    if nameLength:
+                        pass
+                    elif nonResident:
+                        firstVCN, _, runListOffset = NONRESIDENT_HEADER.unpack_from(raw, start + 0x10)
+                        if firstVCN == 0:
+                            size = QWORD.unpack_from(raw, start + 0x30)[0]
+                        pieces.append((firstVCN, parseDataRuns(raw[start:start + length], runListOffset)))
+                        residence = False
+                    else:
+                        size = contentSize
+                        content = bytes(raw[start + contentOffset:start + contentOffset + size])
+                        residence = True
+                elif attrType == 0x30:
+                    offset = start + contentOffset
+                    parentReference, nameChars, namespace = FILE_NAME.unpack_from(raw, offset)
+                    rank = NAME_RANK.get(namespace, 2)
+                    if nameRank is None or rank < nameRank:
+                        nameRank = rank
+                        self.parentID = parentReference & REFERENCE_MASK
+                        self.longName = utf_16_le_decode(raw[offset + 0x42:offset + 0x42 + nameChars * 2])[0]
+                elif attrType == 0x10:
+                    info = STANDARD_INFORMATION.unpack_from(raw, start + contentOffset)
+                elif attrType == 0x20 and not extensions:
+                    if nonResident:
+                        runListOffset = NONRESIDENT_HEADER.unpack_from(raw, start + 0x10)[2]
+                        raise ExtensionsNeeded(runs=parseDataRuns(raw[start:start + length], runListOffset),
+                                               size=QWORD.unpack_from(raw, start + 0x30)[0])
+                    references = listReferences(raw[start + contentOffset:start + contentOffset + contentSize],
+                                                self.fileID)
+                    if references:
+                        raise ExtensionsNeeded(references)
+                start += length
+
+        if info is None:
+            raise Exception("No $STANDARD_INFORMATION attribute")
+        if nameRank is None:
+            raise Exception("No $FILE_NAME attribute")
+
+        self.createdRaw, self.modifiedRaw, dosFlags = info
+        # Only the DOS bits Attribute knows; NORMAL, COMPRESSED, NOT_CONTENT_INDEXED... are dropped
+        dosFlags &= ATTRIBUTE_MASK
+        if self.flag & 2:
+            dosFlags |= Attribute.DIRECTORY.value
+            residence = True
+        self.flags = ATTRIBUTE_FLAGS[dosFlags]
+        # residence stays None when the record has no $DATA
+        self.size = size
+        self.residence = residence
+        self.content = content
+        if len(pieces) == 1:
+            self.runs = pieces[0][1]
+        else:
+            self.runs = []
+            for _, runs in sorted(pieces):
+                self.runs.extend(runs)
+        self._childs: list[MFTRecord] = []
+        self.childLoader = None
+        self.nameIndex = None
+
+    @property
+    def createdTime(self) -> datetime:
+        return getDatetime(self.createdRaw)
+
+    @property
+    def lastModified(self) -> datetime:
+        return getDatetime(self.modifiedRaw)
+
+    @property
+    def clusterOffset(self) -> int:
+        # First allocated cluster of the data, 0 when resident or fully sparse
+        for lcn, _ in self.runs:
+            if lcn is not None:
+                return lcn
+        return 0
+
+    def pack(self) -> tuple:
+        # Compact, picklable form used to ship parsed records between processes
+        return (self.fileID, self.parentID, self.longName, self.flags.value, self.createdRaw, self.modifiedRaw,
+                self.size, self.residence, self.content, tuple(self.runs))
+
+    @classmethod
+    def unpack(cls, packed: tuple) -> 'MFTRecord':
+        record = cls.__new__(cls)
+        (record.fileID, record.parentID, record.longName, flags, record.createdRaw, record.modifiedRaw,
+         record.size, record.residence, record.content, runs) = packed
+        record.runs = list(runs)
+        record.flag = 1
+        record.flags = Attribute(flags)
+        record._childs = []
+        record.childLoader = None
+        record.nameIndex = None
+        return record
+
+    @property
+    def childs(self) -> 'list[MFTRecord]':
+        if self.childLoader is not None:
+            # The loader fills _childs, then clears childLoader
+            self.childLoader(self)
+        return self._childs
 
     def isDirectory(self):
-        return Attribute.DIRECTORY in self.info['flags']
+        return Attribute.DIRECTORY in self.flags
 
     def isLeaf(self):
         return not len(self.childs)
 
     def isActive(self):
-        flags = self.info['flags']
+        flags = self.flags
         if Attribute.SYSTEM in flags or Attribute.HIDDEN in flags:
             return False
         return True
 
     def findRecord(self, name: str):
-        for record in self.childs:
-            if record.fileName['longName'] == name:
-                return record
-        return None
+        # Exact names win; Win32 lookups otherwise ignore case like the $UpCase comparison
+        if self.nameIndex is None:
+            nameIndex = {}
+            for record in self.childs:
+                nameIndex.setdefault(record.longName, record)
+            for record in self.childs:
+                nameIndex.setdefault(record.longName.upper(), record)
+            self.nameIndex = nameIndex
+        record = self.nameIndex.get(name)
+        if record is None:
+            record = self.nameIndex.get(name.upper())
+        return record
 
     def getRecords(self) -> 'list[MFTRecord]':
         recordList: list[MFTRecord] = []
@@ -79,45 +349,200 @@ class MFTRecord:
                 recordList.append(record)
         return recordList
 
-    def parseData(self, start):
-        self.data['residence'] = not bool(self.raw[start + 0x8])
-        if self.data['residence']:
-            offset = int.from_bytes(self.raw[start + 0x14:start + 0x16], byteorder='little')
-            self.data['size'] = int.from_bytes(self.raw[start + 0x10:start + 0x14], byteorder='little')
-            self.data['content'] = self.raw[start + offset:start + offset + self.data['size']]
-        else:
-            clusterChain = self.raw[start + 0x40]
-            offset = (clusterChain & 0xF0) >> 4
-            size = clusterChain & 0x0F
-            self.data['size'] = int.from_bytes(self.raw[start + 0x30: start + 0x38], byteorder='little')
-            self.data['clusterSize'] = int.from_bytes(self.raw[start + 0x41: start + 0x41 + size], byteorder='little')
-            self.data['clusterOffset'] = int.from_bytes(self.raw[start + 0x41 + size: start + 0x41 + size + offset], byteorder='little')
-
-    def parseFileName(self, start):
-        signature = int.from_bytes(self.raw[start:start + 4], byteorder='little')
-        if signature != 0x30:
-            raise Exception("Skip this record")
-
-        # header = self.raw_data[start:start + 0x10]
-        size = int.from_bytes(self.raw[start + 0x10:start + 0x14], byteorder='little')
-        offset = int.from_bytes(self.raw[start + 0x14: start + 0x16], byteorder='little')
-        body = self.raw[start + offset: start + offset + size]
-
-        self.fileName["parentID"] = int.from_bytes(body[:6], byteorder='little')
-        nameLength = body[64]
-        self.fileName["longName"] = body[66:66 + nameLength * 2].decode('utf-16le')  # unicode
 
-    def parseInfo(self, start):
-        sig = int.from_bytes(self.raw[start:start + 4], byteorder='little')
-        if sig != 0x10:
-            raise Exception("Something Wrong!")
-
-        offset = int.from_bytes(self.raw[start + 20:start + 21], byteorder='little')
-        begin = start + offset
-
-        self.info["createdTime"] = getDatetime(int.from_bytes(self.raw[begin:begin + 8], byteorder='little'))
-        self.info["lastModified"] = getDatetime(int.from_bytes(self.raw[begin + 8:begin + 16], byteorder='little'))
-        self.info["flags"] = Attribute(int.from_bytes(self.raw[begin + 32:begin + 36], byteorder='little') & 0xFFFF)
+def parseRecordChunk(chunk: bytes, recordSize: int, firstID=0, pack=True) -> tuple:
+    """Parse every record of a chunk of $MFT, applying fixups in a single copy of it.
+
+    Returns (records, pending, errors, bases). Worker processes get packed
+    tuples as records, the serial path MFTRecord objects. pending holds
+    (record number, raw record, references, runs, size) for records whose
+    extension records must be read first, errors (record number, reason)
+    for records that could not be parsed and bases the base records of the
+    extension records met in the chunk.
+    """
+    buf = bytearray(chunk)
+    view = memoryview(buf)
+    records = []
+    pending = []
+    errors = []
+    bases = set()
+    for start in range(0, len(buf) - recordSize + 1, recordSize):
+        number = firstID + start // recordSize
+        signature = buf[start:start + 4]
+        if signature != b"FILE":
+            # Slots never used are zero-filled, anything else is damage
+            if signature != b"\0\0\0\0":
+                errors.append((number, f"Bad record signature {bytes(signature)!r}"))
+            continue
+        if not buf[start + 0x16] & 1:
+            continue
+        base = QWORD.unpack_from(buf, start + 0x20)[0] & REFERENCE_MASK
+        if base:
+            bases.add(base)
+            continue
+        try:
+            fixupInPlace(buf, start, recordSize)
+            record = MFTRecord(view[start:start + recordSize])
+        except ExtensionsNeeded as e:
+            pending.append((number, bytes(view[start:start + recordSize]), e.references, e.runs, e.size))
+            continue
+        except Exception as e:
+            errors.append((number, str(e)))
+            continue
+        records.append(record.pack() if pack else record)
+    return records, pending, errors, bases
+
+
+def liveRecords(buf, recordSize: int, firstID: int) -> tuple:
+    # Header columns of the in-use base records of a chunk, fixed up in place:
+    # (offsets, first attribute offsets, header flags, record numbers), and the records that failed
+    header = ([], [], [], [])
+    errors = []
+    for start in range(0, len(buf) - recordSize + 1, recordSize):
+        signature = buf[start:start + 4]
+        if signature != b"FILE":
+            if signature != b"\0\0\0\0":
+                errors.append((firstID + start // recordSize, f"Bad record signature {bytes(signature)!r}"))
+            continue
+        if not buf[start + 0x16] & 1 or QWORD.unpack_from(buf, start + 0x20)[0] & REFERENCE_MASK:
+            continue
+        try:
+            fixupInPlace(buf, start, recordSize)
+        except Exception as e:
+            errors.append((firstID + start // recordSize, str(e)))
+            continue
+        fields = RECORD_HEADER.unpack_from(buf, start)
+        for column, value in zip(header, (start, fields[6], fields[7], fields[13])):
+            column.append(value)
+    return header, errors
+
+
+def liveRecordsArray(buf, recordSize: int, firstID: int) -> tuple:
+    """liveRecords on the chunk seen as a NumPy array of records.
+
+    Signature, in-use and base record checks are masks over all records,
+    and when every record shares one update sequence array layout, the
+    fixups of the whole chunk are checked and applied as array operations.
+    The header columns are sliced out of the records that pass in bulk.
+    """
+    table = numpy.frombuffer(buf, dtype=numpy.uint8)[:len(buf) // recordSize * recordSize].reshape(-1, recordSize)
+    signature = table[:, :4].copy().view('<u4')[:, 0]
+    isFile = signature == FILE_SIGNATURE
+    errors = [(firstID + int(row), f"Bad record signature {bytes(table[row, :4])!r}")
+              for row in numpy.flatnonzero(~isFile & (signature != 0))]
+    live = isFile & (table[:, 0x16] & 1 == 1) & ~table[:, 0x20:0x26].any(axis=1)
+    rows = numpy.flatnonzero(live)
+    if not len(rows):
+        return ([], [], [], []), errors
+
+    usa = table[rows, 4:8].copy().view('<u2')
+    if recordSize % NTFS_BLOCK_SIZE or (usa != usa[0]).any():
+        fixed = []
+        for row in rows.tolist():
+            try:
+                fixupInPlace(buf, row * recordSize, recordSize)
+            except Exception as e:
+                errors.append((firstID + row, str(e)))
+                continue
+            fixed.append(row)
+        rows = numpy.array(fixed, dtype=numpy.intp)
+    else:
+        usaOffset, usaCount = int(usa[0, 0]), int(usa[0, 1])
+        count = min(usaCount - 1, recordSize // NTFS_BLOCK_SIZE)
+        if count > 0:
+            blocks = table.reshape(len(table), recordSize // NTFS_BLOCK_SIZE, NTFS_BLOCK_SIZE)
+            tails = blocks[rows, :count, NTFS_BLOCK_SIZE - 2:]
+            usn = table[rows, usaOffset:usaOffset + 2]
+            torn = (tails != usn[:, None, :]).any(axis=(1, 2))
+            fixups = table[rows, usaOffset + 2:usaOffset + 2 + 2 * count].reshape(-1, count, 2)
+            blocks[rows, :count, NTFS_BLOCK_SIZE - 2:] = fixups
+            errors.extend((firstID + int(row), "Torn multi-sector record") for row in rows[torn])
+            rows = rows[~torn]
+    return ((rows * recordSize).tolist(),
+            table[rows, 0x14:0x16].view('<u2')[:, 0].tolist(),
+            table[rows, 0x16:0x18].view('<u2')[:, 0].tolist(),
+            table[rows, 0x2C:0x30].view('<u4')[:, 0].tolist()), errors
+
+
+def catalogChunk(chunk: bytes, recordSize: int, firstID=0) -> tuple:
+    """Pull catalog columns out of a chunk of $MFT without building MFTRecord objects.
+
+    Returns (columns, pending, errors): columns holds the record numbers,
+    parent record numbers, names, sizes, DOS attribute flags and creation
+    and modification times (Unix seconds) of every in-use base record;
+    pending lists records with attributes in extension records, errors
+    (record number, reason) for records that could not be read. Records are
+    filtered and fixed up with NumPy when it is installed.
+    """
+    buf = bytearray(chunk)
+    if numpy is not None:
+        header, errors = liveRecordsArray(buf, recordSize, firstID)
+    else:
+        header, errors = liveRecords(buf, recordSize, firstID)
+
+    view = memoryview(buf)
+    ids, parents, sizes = array('q'), array('q'), array('q')
+    flags = array('l')
+    created, modified = array('d'), array('d')
+    names = []
+    pending = []
+    for start, attrOffset, headerFlags, fileID in zip(*header):
+        raw = view[start:start + recordSize]
+        info = None
+        name = None
+        nameRank = None
+        size = 0
+        listed = False
+        position = attrOffset
+        try:
+            while position + 0x18 <= recordSize:
+                (attrType, length, nonResident, nameLength, _, _, _,
+                 contentSize, contentOffset) = ATTRIBUTE_HEADER.unpack_from(raw, position)
+                if attrType == 0xFFFFFFFF:
+                    break
+                if length < 0x18 or position + length > recordSize:
+                    raise Exception(f"Attribute 0x{attrType:X} overruns the record")
+                if attrType == 0x10:
+                    info = STANDARD_INFORMATION.unpack_from(raw, position + contentOffset)
+                elif attrType == 0x20:
+                    listed = True
+                    break
+                elif attrType == 0x30:
+                    offset = position + contentOffset
+                    parentReference, nameChars, namespace = FILE_NAME.unpack_from(raw, offset)
+                    rank = NAME_RANK.get(namespace, 2)
+                    if nameRank is None or rank < nameRank:
+                        nameRank = rank
+                        name = (parentReference & REFERENCE_MASK,
+                                utf_16_le_decode(raw[offset + 0x42:offset + 0x42 + nameChars * 2])[0])
+                elif attrType == 0x80 and not nameLength:
+                    if not nonResident:
+                        size = contentSize
+                    elif QWORD.unpack_from(raw, position + 0x10)[0] == 0:
+                        size = QWORD.unpack_from(raw, position + 0x30)[0]
+                position += length
+        except Exception as e:
+            errors.append((fileID, str(e)))
+            continue
+        if listed:
+            # The list may put the name or the data in other records; loaded one by one later
+            pending.append(fileID)
+            continue
+        if info is None or name is None:
+            errors.append((fileID, "No $STANDARD_INFORMATION attribute" if info is None else "No $FILE_NAME attribute"))
+            continue
+
+        dosFlags = info[2] & ATTRIBUTE_MASK
+        if headerFlags & 2:
+            dosFlags |= Attribute.DIRECTORY.value
+        ids.append(fileID)
+        parents.append(name[0])
+        names.append(name[1])
+        sizes.append(size)
+        flags.append(dosFlags)
+        created.append(filetimeToUnix(info[0]))
+        modified.append(filetimeToUnix(info[1]))
+    return (ids, parents, names, sizes, flags, created, modified), pending, errors
 
 
 class DirectoryTree:
@@ -128,12 +553,12 @@ class DirectoryTree:
             self.nodeDict[node.fileID] = node
 
         for key in self.nodeDict:
-            parentID = self.nodeDict[key].fileName['parentID']
+            parentID = self.nodeDict[key].parentID
             if parentID in self.nodeDict:
                 self.nodeDict[parentID].childs.append(self.nodeDict[key])
 
         for key in self.nodeDict:
-            parent_id = self.nodeDict[key].fileName['parentID']
+            parent_id = self.nodeDict[key].parentID
             if parent_id == self.nodeDict[key].fileID:
                 self.root = self.nodeDict[key]
                 break
@@ -143,12 +568,84 @@ class DirectoryTree:
         return self.currentDir.findRecord(name)
 
     def getParentRecord(self, record: MFTRecord):
-        return self.nodeDict[record.fileName['parentID']]
+        return self.nodeDict[record.parentID]
+
+    def patch(self, removed: 'set[int]', records: 'list[MFTRecord]'):
+        """Swap reparsed records into the tree in place.
+
+        removed holds every record number that was reparsed; those absent
+        from records are gone. Replaced directories keep their children.
+        """
+        old = {}
+        for fileID in removed.union(record.fileID for record in records):
+            if fileID in self.nodeDict:
+                old[fileID] = self.nodeDict.pop(fileID)
+
+        for record in records:
+            self.nodeDict[record.fileID] = record
+            if record.fileID in old:
+                record._childs = old[record.fileID]._childs
+
+        # Drop stale entries from the child lists they were in, then attach the new records
+        touched = {record.parentID for record in old.values()} | {record.fileID for record in records}
+        for fileID in touched:
+            parent = self.nodeDict.get(fileID)
+            if parent is not None:
+                parent._childs = [child for child in parent._childs if child.fileID not in old]
+                parent.nameIndex = None
+        for record in records:
+            parent = self.nodeDict.get(record.parentID)
+            if parent is not None:
+                parent._childs.append(record)
+                parent.nameIndex = None
+
+        if self.root is not None:
+            self.root = self.nodeDict.get(self.root.fileID)
+        if self.root is None:
+            self.root = next((node for node in self.nodeDict.values() if node.parentID == node.fileID), None)
 
     def getActiveRecords(self) -> 'list[MFTRecord]':
         return self.currentDir.getRecords()
 
 
+class LazyDirectoryTree(DirectoryTree):
+    """Directory tree that loads MFT records only when a path reaches them.
+
+    Children of a directory come from its $I30 index the first time they
+    are needed, so mounting costs the same whatever the size of the MFT.
+    """
+
+    def __init__(self, loadRecord, loadChilds, rootID=5) -> None:
+        self.loadRecord = loadRecord
+        self.loadChilds = loadChilds
+        self.nodeDict: dict[int, MFTRecord] = {}
+        # Reentrant: loading the children of a directory loads their records
+        self.lock = threading.RLock()
+        self.root = self.getRecord(rootID)
+        self.currentDir = self.root
+
+    def getRecord(self, fileID: int) -> MFTRecord:
+        record = self.nodeDict.get(fileID)
+        if record is None:
+            with self.lock:
+                if fileID not in self.nodeDict:
+                    record = self.loadRecord(fileID)
+                    if record.isDirectory():
+                        record.childLoader = self.fillChilds
+                    self.nodeDict[fileID] = record
+                record = self.nodeDict[fileID]
+        return record
+
+    def fillChilds(self, record: MFTRecord):
+        with self.lock:
+            if record.childLoader is not None:
+                record._childs = self.loadChilds(record)
+                record.childLoader = None
+
+    def getParentRecord(self, record: MFTRecord):
+        return self.getRecord(record.parentID)
+
+
 class MFTFile:
     def __init__(self, data: bytes) -> None:
         self.raw = data
@@ -159,6 +656,13 @@ class MFTFile:
         self.dataOffset = self.fileNameOffset + self.fileNameLen
         self.dataLen = int.from_bytes(self.raw[0x104:0x108], byteorder='little')
         self.numSector = (int.from_bytes(self.raw[0x118:0x120], byteorder='little') + 1) * 8
+
+        self.runs = []
+        for attrType, start, length in iterAttributes(self.raw):
+            if attrType == 0x80 and self.raw[start + 8]:
+                runListOffset = int.from_bytes(self.raw[start + 0x20:start + 0x22], byteorder='little')
+                self.runs = parseDataRuns(self.raw[start:start + length], runListOffset)
+                break
         del self.raw
 
 
@@ -175,11 +679,14 @@ class NTFS:
         "MFT record size"
     ]
 
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, device=None, lazy=False, workers=1, index=None, stats=None) -> None:
         self.name = name
         self.cwd = [self.name]
+        self.catalog = None
+        self.badRecords: list[tuple[int, str]] = []
+        self.stats = stats if stats is not None else NULL_STATS
         try:
-            self.fd = open(r'\\.\%s' % self.name, 'rb')
+            self.device = device if device is not None else open_device(self.name, stats=stats)
         except FileNotFoundError:
             print(f"[ERROR] No volume named {name}")
             exit()
@@ -192,7 +699,7 @@ class NTFS:
             exit()
 
         try:
-            self.bootSectorRaw = self.fd.read(0x200)
+            self.bootSectorRaw = bytes(self.device.read_at(0, 0x200))
             self.bootSector = {}
             self.extractBootSector()
 
@@ -206,34 +713,51 @@ class NTFS:
 
             self.recordSize = self.bootSector["MFT record size"]
             self.mftOffset = self.bootSector['First Cluster of $MFT']
-            self.fd.seek(self.mftOffset * self.spc * self.bps)
-            self.mftFile = MFTFile(self.fd.read(self.recordSize))
-
-            mftRecord: list[MFTRecord] = []
-            for _ in range(2, self.mftFile.numSector, 2):
-                dat = self.fd.read(self.recordSize)
-                if dat[:4] == b"FILE":
-                    try:
-                        mftRecord.append(MFTRecord(dat))
-                    except Exception as e:
-                        pass
+            self.readMFTFile()
+
+            if lazy:
+                self.dirTree = LazyDirectoryTree(self.loadRecord, self.loadChilds)
+                return
+
+            self.index = None
+            self.chunkDigests: dict[int, str] = {}
+            if index is not None:
+                # The sidecar holds the tree as of the last run; only $MFT chunks changed since are reparsed
+                self.index = MetadataIndex(index)
+                key = {
+                    "serial": self.bootSector['Serial Number'],
+                    "boot": digest(self.bootSectorRaw),
+                }
+                if self.index.open(key):
+                    self.dirTree = DirectoryTree([MFTRecord.unpack(row) for row in self.index.load_records()])
+                    self.chunkDigests = self.index.load_chunks()
+                    self.refresh()
+                    return
+
+            mftRecord = self.readMFTRecords(workers)
+            if self.index is not None:
+                self.index.save((record.pack() for record in mftRecord), self.chunkDigests)
             self.dirTree = DirectoryTree(mftRecord)
         except Exception as e:
             print(f"[ERROR] {e}")
             exit()
 
     @staticmethod
-    def isNTFS(name: str):
+    def isNTFS(name: str, device=None):
         try:
-            with open(r'\\.\%s' % name, 'rb') as fd:
-                oem_id = fd.read(0xB)[3:]
-                if oem_id == b'NTFS    ':
-                    return True
-                return False
+            if device is None:
+                with open_device(name, 'file') as fd:
+                    oem_id = fd.read_at(3, 8)
+            else:
+                oem_id = device.read_at(3, 8)
+            if oem_id == b'NTFS    ':
+                return True
+            return False
         except Exception as e:
             print(f"[ERROR] {e}")
             exit()
 
+    @timed("boot parse")
     def extractBootSector(self):
         self.bootSector['OEM ID'] = self.bootSectorRaw[3:0xB]
         self.bootSector['Bytes Per Sector'] = int.from_bytes(self.bootSectorRaw[0xB:0xD], byteorder='little')
@@ -247,10 +771,280 @@ class NTFS:
         self.bootSector['Serial Number'] = int.from_bytes(self.bootSectorRaw[0x48:0x50], byteorder='little')
         self.bootSector['Signature'] = self.bootSectorRaw[0x1FE:0x200]
 
+    def readMFTFile(self):
+        # Record 0 describes where $MFT itself lives; it moves and grows with the volume
+        mftStart = self.mftOffset * self.spc * self.bps
+        self.mftFile = MFTFile(applyFixup(self.device.read_at(mftStart, self.recordSize)))
+
+    def readMFTChunks(self, chunkSize=MFT_CHUNK_SIZE, offsets=None):
+        """Large sequential reads over every run of $MFT, cut on record boundaries.
+
+        Yields (offset in $MFT, data) pairs, only for the given offsets if any.
+        """
+        clusterBytes = self.spc * self.bps
+        chunkSize = max(chunkSize // self.recordSize, 1) * self.recordSize
+        position = 0
+        for lcn, count in self.mftFile.runs:
+            length = count * clusterBytes
+            if lcn is not None:
+                start = lcn * clusterBytes
+                for offset in range(0, length, chunkSize):
+                    if offsets is None or position + offset in offsets:
+                        yield position + offset, self.device.read_at(start + offset, min(chunkSize, length - offset))
+            position += length
+
+    def hashMFTChunks(self, chunks):
+        # Digests of every chunk passing through, the snapshot refresh() compares against
+        for offset, chunk in chunks:
+            self.chunkDigests[offset] = digest(chunk)
+            yield offset, chunk
+
+    @timed("MFT scan")
+    def readMFTRecords(self, workers=1) -> 'list[MFTRecord]':
+        self.chunkDigests = {}
+        return self.collectRecords(self.scanMFT(workers, self.hashMFTChunks(self.readMFTChunks())))
+
+    def mapChunks(self, function, chunks, workers=1, *args):
+        """Yield function(chunk, recordSize, firstID, *args) for every chunk, in order.
+
+        With several workers the calls run in worker processes.
+        """
+        if workers <= 1:
+            for offset, chunk in chunks:
+                yield function(chunk, self.recordSize, offset // self.recordSize, *args)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            pending = deque()
+            for offset, chunk in chunks:
+                pending.append(executor.submit(function, bytes(chunk), self.recordSize,
+                                               offset // self.recordSize, *args))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def scanMFT(self, workers=1, chunks=None):
+        """Parse $MFT chunk by chunk, yielding what parseRecordChunk returns for each.
+
+        Records are always MFTRecord objects; worker processes ship them packed.
+        """
+        if chunks is None:
+            chunks = self.readMFTChunks()
+        if workers <= 1:
+            yield from self.mapChunks(parseRecordChunk, chunks, 1, False)
+            return
+        for records, *rest in self.mapChunks(parseRecordChunk, chunks, workers, True):
+            yield [MFTRecord.unpack(packed) for packed in records], *rest
+
+    def collectRecords(self, results, bases=None) -> 'list[MFTRecord]':
+        """Gather the records of scanMFT results, reading extension records where needed.
+
+        Records that cannot be parsed are reported, never dropped quietly;
+        bases, if given, receives the base records of extension records.
+        """
+        mftRecord: list[MFTRecord] = []
+        errors = []
+        for records, pending, chunkErrors, chunkBases in results:
+            mftRecord.extend(records)
+            errors.extend(chunkErrors)
+            for fileID, raw, references, runs, size in pending:
+                try:
+                    mftRecord.append(self.resolveExtensions(raw, references, runs, size))
+                except Exception as e:
+                    errors.append((fileID, str(e)))
+            if bases is not None:
+                bases.update(chunkBases)
+        self.reportBadRecords(errors)
+        return mftRecord
+
+    def readRuns(self, runs, size) -> bytes:
+        clusterBytes = self.spc * self.bps
+        data = b"".join(bytes(count * clusterBytes) if lcn is None else
+                        bytes(self.device.read_at(lcn * clusterBytes, count * clusterBytes))
+                        for lcn, count in runs)
+        return data[:size]
+
+    def resolveExtensions(self, raw, references, runs, size) -> MFTRecord:
+        if runs:
+            # The $ATTRIBUTE_LIST itself is non-resident
+            references = listReferences(self.readRuns(runs, size), RECORD_HEADER.unpack_from(raw)[-1])
+        return MFTRecord(raw, [self.readRecord(reference) for reference in references])
+
+    def readExtensions(self, raw) -> 'list[bytearray]':
+        # The extension records named by the $ATTRIBUTE_LIST of a base record, if it has one
+        for attrType, start, length in iterAttributes(raw):
+            if attrType != 0x20:
+                continue
+            if raw[start + 8]:
+                runListOffset = NONRESIDENT_HEADER.unpack_from(raw, start + 0x10)[2]
+                data = self.readRuns(parseDataRuns(raw[start:start + length], runListOffset),
+                                     QWORD.unpack_from(raw, start + 0x30)[0])
+            else:
+                data = getResidentContent(raw, start)
+            references = listReferences(data, RECORD_HEADER.unpack_from(raw)[-1])
+            return [self.readRecord(reference) for reference in references]
+        return []
+
+    def reportBadRecords(self, errors):
+        if not errors:
+            return
+        self.badRecords.extend(errors)
+        self.stats.count('bad records', len(errors))
+        print(f"[WARNING] {len(errors)} MFT record(s) could not be parsed, "
+              f"first: record {errors[0][0]}: {errors[0][1]}")
+
+    def readRecord(self, fileID: int) -> bytearray:
+        # $MFT may itself be fragmented, so walk its data runs
+        clusterBytes = self.spc * self.bps
+        position = fileID * self.recordSize
+        for lcn, count in self.mftFile.runs:
+            if position < count * clusterBytes:
+                if lcn is None:
+                    break
+                data = self.device.read_at(lcn * clusterBytes + position, self.recordSize)
+                if data[:4] != b"FILE":
+                    break
+                return applyFixup(data)
+            position -= count * clusterBytes
+        raise Exception(f"MFT record {fileID} not found")
+
+    @timed("MFT record load")
+    def loadRecord(self, fileID: int) -> MFTRecord:
+        raw = self.readRecord(fileID)
+        try:
+            return MFTRecord(raw)
+        except ExtensionsNeeded as e:
+            return self.resolveExtensions(raw, e.references, e.runs, e.size)
+
+    def readIndexEntries(self, fileID: int):
+        base = self.readRecord(fileID)
+        clusterBytes = self.spc * self.bps
+        blockSize = 0
+        pieces = []
+        bitmap = None
+
+        # Large directories keep parts of $I30 in the extension records of their $ATTRIBUTE_LIST
+        for raw in (base, *self.readExtensions(base)):
+            for attrType, start, length in iterAttributes(raw):
+                if attrType not in (0x90, 0xA0, 0xB0) or getAttributeName(raw, start) != "$I30":
+                    continue
+                if attrType == 0x90:
+                    root = getResidentContent(raw, start)
+                    blockSize = int.from_bytes(root[0x8:0xC], byteorder='little')
+                    yield from parseIndexEntries(root, 0x10)
+                elif attrType == 0xA0:
+                    firstVCN, _, runListOffset = NONRESIDENT_HEADER.unpack_from(raw, start + 0x10)
+                    pieces.append((firstVCN, parseDataRuns(raw[start:start + length], runListOffset)))
+                elif raw[start + 8]:
+                    runListOffset = NONRESIDENT_HEADER.unpack_from(raw, start + 0x10)[2]
+                    bitmap = self.readRuns(parseDataRuns(raw[start:start + length], runListOffset),
+                                           QWORD.unpack_from(raw, start + 0x30)[0])
+                else:
+                    bitmap = bytes(getResidentContent(raw, start))
+        allocation = [run for _, runs in sorted(pieces, key=lambda piece: piece[0]) for run in runs]
+
+        block = 0
+        for lcn, count in allocation:
+            if lcn is None:
+                block += count * clusterBytes // blockSize
+                continue
+            data = self.device.read_at(lcn * clusterBytes, count * clusterBytes)
+            for offset in range(0, len(data) - blockSize + 1, blockSize):
+                inUse = bitmap is None or (block // 8 < len(bitmap) and bitmap[block // 8] >> (block % 8) & 1)
+                block += 1
+                if not inUse or data[offset:offset + 4] != b"INDX":
+                    continue
+                node = applyFixup(data[offset:offset + blockSize])
+                yield from parseIndexEntries(node, 0x18)
+
+    @timed("directory read")
+    def loadChilds(self, record: MFTRecord) -> 'list[MFTRecord]':
+        childs: list[MFTRecord] = []
+        errors = []
+        seen = {record.fileID}
+        for fileID, namespace in self.readIndexEntries(record.fileID):
+            # Namespace 2 is the DOS 8.3 alias of an entry listed again under its long name
+            if namespace == 2 or fileID in seen:
+                continue
+            seen.add(fileID)
+            try:
+                childs.append(self.dirTree.getRecord(fileID))
+            except Exception as e:
+                errors.append((fileID, str(e)))
+        self.reportBadRecords(errors)
+        return childs
+
+    @timed("MFT refresh")
+    def refresh(self) -> dict:
+        """Bring the tree up to date with the volume without a full rescan.
+
+        $MFT is hashed chunk by chunk against the digests taken at the last
+        scan; only chunks that differ are reparsed and patched into the tree.
+        A lazy tree just drops the records it has loaded.
+        """
+        summary = {"chunks": 0, "changed": 0, "records": 0}
+        self.device.invalidate()
+        self.readMFTFile()
+        if isinstance(self.dirTree, LazyDirectoryTree):
+            with self.dirTree.lock:
+                self.dirTree.nodeDict.clear()
+                self.dirTree.root = self.dirTree.getRecord(self.dirTree.root.fileID)
+            self.catalog = None
+        else:
+            digests = {}
+            lengths = {}
+            for offset, chunk in self.readMFTChunks():
+                digests[offset] = digest(chunk)
+                lengths[offset] = len(chunk)
+            changed = {offset for offset in digests if self.chunkDigests.get(offset) != digests[offset]}
+            summary["chunks"] = len(digests)
+            summary["changed"] = len(changed)
+
+            # Record numbers held by reparsed chunks, and those no chunk holds any more ($MFT shrank)
+            removed = set()
+            for offset in changed:
+                removed.update(range(offset // self.recordSize, (offset + lengths[offset]) // self.recordSize))
+            starts = sorted(digests)
+            for fileID in self.dirTree.nodeDict:
+                position = fileID * self.recordSize
+                i = bisect_right(starts, position) - 1
+                if i < 0 or position >= starts[i] + lengths[starts[i]]:
+                    removed.add(fileID)
+
+            bases = set()
+            records = self.collectRecords(self.scanMFT(1, self.readMFTChunks(offsets=changed)), bases)
+            # A changed extension record changes its base record, wherever that lives
+            for fileID in bases - removed:
+                removed.add(fileID)
+                try:
+                    records.append(self.loadRecord(fileID))
+                except Exception as e:
+                    self.reportBadRecords([(fileID, str(e))])
+            if removed or records:
+                self.dirTree.patch(removed, records)
+                self.catalog = None
+                if self.index is not None:
+                    self.index.update_records(removed, (record.pack() for record in records))
+            if self.index is not None and digests != self.chunkDigests:
+                self.index.save_chunks(digests)
+            self.chunkDigests = digests
+            summary["records"] = len(records)
+
+        # The current directory may have been replaced or removed
+        try:
+            self.dirTree.currentDir = self.visitDir("\\".join(self.cwd))
+        except Exception:
+            self.dirTree.currentDir = self.dirTree.root
+            self.cwd = [self.name]
+        return summary
+
     def parsePath(self, path):
         directory = re.sub(r"[/\\]+", r"\\", path).strip("\\").split("\\")
         return directory
 
+    @timed("path resolution")
     def visitDir(self, path) -> MFTRecord:
         if path == "":
             raise Exception("Directory name is required!")
@@ -271,7 +1065,7 @@ class NTFS:
             record = curDir.findRecord(dir)
 
             if record is None:
-                raise Exception("Directory not found!")
+                raise FileNotFoundError("Directory not found!")
             if record.isDirectory():
                 curDir = record
             else:
@@ -288,21 +1082,119 @@ class NTFS:
 
             ret = []
             for record in recordList:
-                obj = {}
-                obj["Flags"] = record.info["flags"].value
-                obj["Date Modified"] = record.info["lastModified"]
-                obj["Size"] = record.data["size"]
-                obj["Name"] = record.fileName["longName"]
-
-                if record.data["residence"]:
-                    obj["Sector"] = self.mftOffset * self.spc + record.fileID
-                else:
-                    obj["Sector"] = record.data["clusterOffset"] * self.spc
-                ret.append(obj)
+                ret.append(self.recordToDict(record))
             return ret
         except Exception as e:
             raise (e)
 
+    def recordToDict(self, record: MFTRecord) -> dict:
+        obj = {}
+        obj["Flags"] = record.flags.value
+        obj["Date Created"] = record.createdTime
+        obj["Date Modified"] = record.lastModified
+        obj["Size"] = record.size
+        obj["Name"] = record.longName
+
+        if record.residence is not False:
+            obj["Sector"] = self.mftOffset * self.spc + record.fileID
+        else:
+            obj["Sector"] = record.clusterOffset * self.spc
+        return obj
+
+    def walk(self, path="", hidden=False):
+        """Like os.walk: yield (dirpath, dirs, files) top-down without changing the current directory.
+
+        dirs and files hold getDirectory-style dicts; removing items from dirs
+        prunes the walk. Hidden and system entries are left out unless hidden.
+        """
+        if path != "":
+            curDir = self.visitDir(path)
+            dirpath = "\\".join(self.parsePath(path))
+        else:
+            curDir = self.dirTree.currentDir
+            dirpath = self.getCWD().rstrip("\\")
+
+        visited = set()
+        stack = [(dirpath, curDir)]
+        while stack:
+            dirpath, curDir = stack.pop()
+            if curDir.fileID in visited:
+                continue
+            visited.add(curDir.fileID)
+
+            subdirs = {}
+            dirs, files = [], []
+            for record in (curDir.childs if hidden else curDir.getRecords()):
+                if record.fileID == curDir.fileID:
+                    continue
+                if record.isDirectory():
+                    subdirs[record.longName] = record
+                    dirs.append(self.recordToDict(record))
+                else:
+                    files.append(self.recordToDict(record))
+            yield dirpath, dirs, files
+
+            for obj in reversed(dirs):
+                record = subdirs[obj["Name"]]
+                stack.append((dirpath + "\\" + record.longName, record))
+
+    def buildCatalog(self) -> FileCatalog:
+        if isinstance(self.dirTree, LazyDirectoryTree):
+            # Only the records reached so far are loaded; walk pulls in the rest
+            return FileCatalog.fromWalk(self.name, self.walk(self.name, hidden=True))
+
+        # Every child, hidden and system ones too; find's filters decide what to show
+        catalog = FileCatalog(self.name)
+        visited = {self.dirTree.root.fileID}
+        queue = deque([(self.dirTree.root, -1)])
+        while queue:
+            curDir, parent = queue.popleft()
+            for record in curDir.childs:
+                if record.fileID in visited:
+                    continue
+                mtime = filetimeToUnix(record.modifiedRaw)
+                ctime = filetimeToUnix(record.createdRaw)
+                row = catalog.add(parent, record.longName, record.size, record.flags.value, mtime, ctime)
+                if record.isDirectory():
+                    visited.add(record.fileID)
+                    queue.append((record, row))
+        return catalog
+
+    @timed("MFT catalog scan")
+    def scanCatalog(self, workers=1) -> FileCatalog:
+        """Catalog of every in-use record of $MFT, hidden and system files included.
+
+        Columns come straight from the $MFT chunks (see catalogChunk), so
+        no MFTRecord is built apart from the few records with an
+        $ATTRIBUTE_LIST, and the tree, lazy or not, is left alone.
+        """
+        columns = (array('q'), array('q'), [], array('q'), array('l'), array('d'), array('d'))
+        errors = []
+        for chunkColumns, pending, chunkErrors in self.mapChunks(catalogChunk, self.readMFTChunks(), workers):
+            for column, values in zip(columns, chunkColumns):
+                column.extend(values)
+            errors.extend(chunkErrors)
+            for fileID in pending:
+                try:
+                    record = self.loadRecord(fileID)
+                except Exception as e:
+                    errors.append((fileID, str(e)))
+                    continue
+                for column, value in zip(columns, (
+                        record.fileID, record.parentID, record.longName, record.size, record.flags.value,
+                        filetimeToUnix(record.createdRaw), filetimeToUnix(record.modifiedRaw))):
+                    column.append(value)
+        self.reportBadRecords(errors)
+        ids, parents, names, sizes, flags, created, modified = columns
+        return FileCatalog.fromColumns(self.name, ids, parents, names, sizes, flags, created, modified,
+                                       self.dirTree.root.fileID)
+
+    def find(self, pattern=None, **filters) -> 'list[tuple[str, dict]]':
+        """Search the whole volume; see FileCatalog.find for the filters."""
+        if self.catalog is None:
+            self.catalog = self.buildCatalog()
+        return [(path, self.catalog.toDict(row)) for path, row in self.catalog.find(pattern, **filters)]
+
     def changeDirectory(self, path=""):
         if path == "":
             raise Exception("Path to directory is required!")
@@ -330,7 +1222,8 @@ class NTFS:
             return self.cwd[0] + "\\"
         return "\\".join(self.cwd)
 
-    def getText(self, path: str) -> str:
+    @timed("path resolution")
+    def findFile(self, path: str) -> MFTRecord:
         path = self.parsePath(path)
         if len(path) > 1:
             name = path[-1]
@@ -344,39 +1237,69 @@ class NTFS:
             raise Exception("File doesn't exist")
         if record.isDirectory():
             raise Exception("Is a directory")
-        if 'residence' not in record.data:
-            return ''
-
-        if record.data['residence']:
-            try:
-                data = record.data['content'].decode()
-            except UnicodeDecodeError as e:
-                raise Exception(
-                    "Not a text file, please use appropriate software to open.")
-            except Exception as e:
-                raise (e)
-            return data
+        return record
+
+    @timed("path resolution")
+    def stat(self, path: str) -> dict:
+        """getDirectory-style dict of a file or directory, looked up in its parent only."""
+        parts = self.parsePath(path)
+        if parts == [self.name]:
+            return dict(self.recordToDict(self.dirTree.root), Name=self.name)
+        parent = "\\".join(parts[:-1])
+        directory = self.visitDir(parent) if parent else self.dirTree.currentDir
+        record = directory.findRecord(parts[-1])
+        if record is None:
+            raise FileNotFoundError(path)
+        return self.recordToDict(record)
+
+    def open(self, path: str) -> ExtentStream:
+        record = self.findFile(path)
+        if record.residence is None:
+            return ExtentStream(MemoryDevice(b''), [], 0, self.stats)
+
+        if record.residence:
+            content = record.content
+            return ExtentStream(MemoryDevice(content), [(0, len(content))], len(content), self.stats)
+
+        return ExtentStream(self.device, self.getExtents(record), record.size, self.stats)
+
+    def getExtents(self, record: MFTRecord) -> 'list[tuple[int, int]]':
+        # Byte extents of the data runs; physically adjacent runs are merged, sparse ones have no offset
+        clusterBytes = self.spc * self.bps
+        extents = []
+        for lcn, count in record.runs:
+            offset = None if lcn is None else lcn * clusterBytes
+            if extents:
+                lastOffset, lastLength = extents[-1]
+                if (offset is None and lastOffset is None) or \
+                        (offset is not None and lastOffset is not None and lastOffset + lastLength == offset):
+                    extents[-1] = (lastOffset, lastLength + count * clusterBytes)
+                    continue
+            extents.append((offset, count * clusterBytes))
+        return extents
+
+    def readFiles(self, paths):
+        """Read whole files in on-disk order, yielding (path, data) as each one completes."""
+        files = []
+        for path in paths:
+            record = self.findFile(path)
+            if record.residence is False:
+                files.append((path, self.getExtents(record), record.size))
+            else:
+                # Resident data is already in memory
+                yield path, bytearray(record.content or b'')
+        yield from read_batch(self.device, files)
 
-        else:
-            data = ""
-            sizeLeft = record.data['size']
-            offset = record.data['clusterOffset'] * self.spc * self.bps
-            clusterNum = record.data['clusterSize']
-            self.fd.seek(offset)
-
-            for _ in range(clusterNum):
-                if sizeLeft <= 0:
-                    break
-                raw_data = self.fd.read(min(self.spc * self.bps, sizeLeft))
-                sizeLeft -= self.spc * self.bps
+    def getText(self, path: str) -> str:
+        with self.open(path) as stream:
+            return "".join(iter_text(stream))
 
-                try:
-                    data += raw_data.decode()
-                except UnicodeDecodeError as e:
-                    raise Exception("Not a text file, please use appropriate software to open.")
-                except Exception as e:
-                    raise (e)
-            return data
+    def getStats(self) -> dict:
+        """Phase timers and I/O counters, plus block cache statistics when there is one."""
+        stats = dict(self.stats.to_dict(), enabled=self.stats.enabled)
+        if isinstance(self.device, CachedDevice):
+            stats["block cache"] = self.device.stats()
+        return stats
 
     def __str__(self) -> str:
         s = "---VOLUME INFORMATION---\n"
@@ -386,6 +1309,8 @@ class NTFS:
         return s
 
     def __del__(self):
-        if getattr(self, "fd", None):
+        if getattr(self, "index", None) is not None:
+            self.index.close()
+        if getattr(self, "device", None) is not None:
             print("Closing Volume...")
-            self.fd.close()
+            self.device.close()
@@ -0,0 +1,112 @@
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+NULL_PHASE = nullcontext()
+
+
+class Phase:
+    __slots__ = ('stats', 'name', 'active', 'start')
+
+    def __init__(self, stats: 'Stats', name: str, active: set) -> None:
+        self.stats = stats
+        self.name = name
+        self.active = active
+
+    def __enter__(self):
+        self.active.add(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+        self.active.discard(self.name)
+
+
+class Stats:
+    """Counters and phase timers shared by a device and the volume parsed from it.
+
+    A phase nested in itself (find_file calling visitDirectory, say) is
+    only timed once, so phase times never count the same work twice.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = defaultdict(int)
+            self.times = defaultdict(float)
+            self.calls = defaultdict(int)
+
+    def phase(self, name: str):
+        active = getattr(self.local, 'active', None)
+        if active is None:
+            active = self.local.active = set()
+        if name in active:
+            return NULL_PHASE
+        return Phase(self, name, active)
+
+    def add_time(self, name: str, seconds: float):
+        with self.lock:
+            self.times[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name: str, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "phases": {name: {"seconds": self.times[name], "calls": self.calls[name]} for name in self.times},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class NullStats:
+    """Stand-in used when instrumentation is off; every call is a no-op."""
+
+    enabled = False
+
+    def reset(self):
+        pass
+
+    def phase(self, name: str):
+        return NULL_PHASE
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, amount=1):
+        pass
+
+    def to_dict(self) -> dict:
+        return {"phases": {}, "counters": {}}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+NULL_STATS = NullStats()
+
+
+def timed(name: str):
+    """Time a method as phase name of its object's stats."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.stats.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,209 @@
+import codecs
+import io
+from bisect import bisect_right
+from Stats import NULL_STATS, timed
+
+CHUNK_SIZE = 1024 * 1024
+READ_GAP = 64 * 1024
+MAX_READ = 8 * 1024 * 1024
+BATCH_BYTES = 64 * 1024 * 1024
+
+
+class ExtentStream(io.RawIOBase):
+    """Seekable read-only view of a file laid out as a list of extents.
+
+    Each extent is an (offset, length) pair in bytes on the underlying
+    device; an offset of None is a hole that reads back as zeros.
+    """
+
+    def __init__(self, device, extents, size, stats=NULL_STATS) -> None:
+        super().__init__()
+        self.device = device
+        self.stats = stats
+        self.size = size
+        self.pos = 0
+
+        # Logical start of every extent, so seeking is a bisect away
+        self.extents = []
+        start = 0
+        for offset, length in extents:
+            if start >= size:
+                break
+            length = min(length, size - start)
+            self.extents.append((start, offset, length))
+            start += length
+        self.starts = [extent[0] for extent in self.extents]
+        self.current = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError("Invalid whence")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self.pos = pos
+        return self.pos
+
+    def find_extent(self):
+        # Streams are mostly read forward, so try the last extent before bisecting
+        if self.current < len(self.extents):
+            start, _, length = self.extents[self.current]
+            if start <= self.pos < start + length:
+                return self.extents[self.current]
+        index = bisect_right(self.starts, self.pos) - 1
+        if index < 0:
+            return None
+        start, _, length = self.extents[index]
+        if self.pos >= start + length:
+            return None
+        self.current = index
+        return self.extents[index]
+
+    @timed("file read")
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        view = memoryview(buffer).cast('B')
+        total = 0
+
+        # Fill the caller's buffer across extent boundaries
+        while total < len(view):
+            extent = self.find_extent()
+            if extent is None:
+                break
+
+            start, offset, length = extent
+            count = min(len(view) - total, start + length - self.pos)
+            if offset is None:
+                view[total:total + count] = bytes(count)
+            else:
+                count = self.device.readinto_at(offset + self.pos - start, view[total:total + count])
+                if not count:
+                    break
+            self.pos += count
+            total += count
+        return total
+
+    def readall(self) -> bytes:
+        data = bytearray(max(self.size - self.pos, 0))
+        view = memoryview(data)
+        got = 0
+        while got < len(data):
+            count = self.readinto(view[got:])
+            if not count:
+                break
+            got += count
+        return bytes(data[:got])
+
+
+def iter_chunks(stream, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_text(stream, encoding='utf-8', chunk_size=CHUNK_SIZE):
+    # Incremental decoding keeps multi-byte characters split across chunks intact
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        for chunk in iter_chunks(stream, chunk_size):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+    except UnicodeDecodeError:
+        raise Exception("Not a text file, please use appropriate software to open.")
+
+
+def read_batch(device, files, gap=READ_GAP, max_read=MAX_READ, budget=BATCH_BYTES):
+    """Read many whole files with few device reads issued in disk order.
+
+    files yields (key, extents, size) with extents as in ExtentStream.
+    Results come back as (key, data) when a file is complete, which is disk
+    order rather than request order. Files are scheduled in groups of about
+    budget bytes so memory stays bounded.
+    """
+    pending = []
+    for key, extents, size in files:
+        clipped = []
+        start = 0
+        for offset, length in extents:
+            if start >= size:
+                break
+            length = min(length, size - start)
+            clipped.append((offset, length))
+            start += length
+        first = min((offset for offset, _ in clipped if offset is not None), default=None)
+        if first is None:
+            # Empty or fully sparse: nothing to read
+            yield key, bytearray(size)
+            continue
+        pending.append((first, key, clipped, size))
+
+    pending.sort(key=lambda item: item[0])
+    group = []
+    group_bytes = 0
+    for item in pending:
+        if group and group_bytes + item[3] > budget:
+            yield from read_group(device, group, gap, max_read)
+            group, group_bytes = [], 0
+        group.append(item)
+        group_bytes += item[3]
+    if group:
+        yield from read_group(device, group, gap, max_read)
+
+
+def read_group(device, group, gap, max_read):
+    buffers = {}
+    remaining = {}
+    pieces = []
+    for i, (_, key, extents, size) in enumerate(group):
+        buffers[i] = bytearray(size)
+        remaining[i] = 0
+        pos = 0
+        for offset, length in extents:
+            # Long extents are split so no single read exceeds max_read
+            for part in range(0, length if offset is not None else 0, max_read):
+                pieces.append((offset + part, min(max_read, length - part), i, pos + part))
+                remaining[i] += 1
+            pos += length
+    pieces.sort()
+
+    # Coalesce pieces that touch or sit within gap bytes of each other
+    reads = []
+    for piece in pieces:
+        offset, length = piece[0], piece[1]
+        if reads:
+            start, end, members = reads[-1]
+            if offset - end <= gap and max(end, offset + length) - start <= max_read:
+                reads[-1] = (start, max(end, offset + length), members)
+                members.append(piece)
+                continue
+        reads.append((offset, offset + length, [piece]))
+
+    for start, end, members in reads:
+        data = device.read_at(start, end - start)
+        for offset, length, i, pos in members:
+            chunk = data[offset - start:offset - start + length]
+            buffers[i][pos:pos + len(chunk)] = chunk
+            remaining[i] -= 1
+            if not remaining[i]:
+                yield group[i][1], buffers.pop(i)
@@ -1,7 +1,24 @@
+import argparse
 import cmd
+import json
+import shlex
+import time
+from datetime import datetime
 from typing import Union
+from Catalog import ATTRIBUTES
+from Extract import WORKERS, extract
+from Hash import ALGORITHMS, hash_files
 from FAT32 import Fat32_Main
 from NTFS import NTFS
+from Stream import iter_text
+
+
+def split_args(arg: str) -> 'list[str]':
+    # Quotes group words, but backslashes are path separators here, not escapes
+    lexer = shlex.shlex(arg, posix=True)
+    lexer.escape = ''
+    lexer.whitespace_split = True
+    return list(lexer)
 
 
 class UI(cmd.Cmd):
@@ -11,7 +28,13 @@ class UI(cmd.Cmd):
              "3. Type 'data + filename' to retrieve file content.\n"
              "     - First, you have to be into the directory that contains this file.\n"
              "4. Type 'cd + directory' to change the current directory.\n"
-             "5. Type 'exit' to quit the program.\n")
+             "5. Type 'find + pattern' to search the whole volume, 'find -h' lists the filters.\n"
+             "6. Type 'extract + source + destination' to copy a file or directory to this computer.\n"
+             "7. Type 'hash + path' to compute MD5/SHA-256 of every file under it.\n"
+             "8. Type 'stats' to show I/O counters and phase timings ('stats reset', 'stats --json file').\n"
+             "9. Type 'refresh' to pick up changes made to an NTFS volume since it was opened.\n"
+             "10. Type 'catalog + file' to export every file of the volume to CSV (or .npz with NumPy).\n"
+             "11. Type 'exit' to quit the program.\n")
 
     def __init__(self, volume: Union[Fat32_Main, NTFS]) -> None:
         super(UI, self).__init__()
@@ -29,7 +52,7 @@ class UI(cmd.Cmd):
             print(f"[ERROR] {e}")
 
     def do_tree(self, arg):
-        def printTree(entry, prefix="", last=False):
+        def printEntry(entry, prefix, last):
             print(f'{prefix + ("└── " if last else "├── ") + entry["Name"]:<40}', end=' ')
 
             # print status of file/folder
@@ -46,47 +69,201 @@ class UI(cmd.Cmd):
             # print size of file/folder
             print("| Size: " + str(entry["Size"]))
 
-            # check if is archive
-            if entry["Flags"] & 0b100000:
+        try:
+            # walk() yields directories depth-first in the order they are listed,
+            # so each listing continues right under the line of its directory
+            frames = []
+            prefix = ""
+            for dirpath, dirs, files in self.vol.walk(arg.strip()):
+                if not frames:
+                    print(dirpath if "\\" in dirpath else dirpath + "\\")
+                frames.append([dirs + files, len(dirs), 0, prefix])
+
+                while frames:
+                    frame = frames[-1]
+                    entries, numberOfDirs, i, framePrefix = frame
+                    if i == len(entries):
+                        frames.pop()
+                        continue
+                    frame[2] += 1
+                    last = i == len(entries) - 1
+                    printEntry(entries[i], framePrefix, last)
+                    if i < numberOfDirs:
+                        prefix = framePrefix + ("    " if last else "│   ")
+                        break
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    def do_data(self, arg):
+        if arg == "":
+            print(f"[ERROR] Please provide a path")
+            return
+        try:
+            with self.vol.open(arg) as stream:
+                for text in iter_text(stream):
+                    print(text, end="")
+            print()
+
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    def do_find(self, arg):
+        def size(value):
+            units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+            if value[-1:].upper() in units:
+                return int(value[:-1]) * units[value[-1].upper()]
+            return int(value)
+
+        def attributes(value):
+            mask = 0
+            for name in value.split(","):
+                if name not in ATTRIBUTES:
+                    raise argparse.ArgumentTypeError(f"unknown attribute {name}, use {','.join(ATTRIBUTES)}")
+                mask |= ATTRIBUTES[name]
+            return mask
+
+        parser = argparse.ArgumentParser(prog="find", add_help=True)
+        parser.add_argument("pattern", nargs="?", help="glob on the name, e.g. *.txt (case-insensitive)")
+        parser.add_argument("--regex", help="regular expression searched in the name")
+        parser.add_argument("--min-size", type=size, help="smallest size, e.g. 10K")
+        parser.add_argument("--max-size", type=size, help="largest size, e.g. 2M")
+        parser.add_argument("--after", type=datetime.fromisoformat, help="modified on or after YYYY-MM-DD")
+        parser.add_argument("--before", type=datetime.fromisoformat, help="modified before YYYY-MM-DD")
+        parser.add_argument("--attr", type=attributes, default=0, help="required attributes, e.g. dir,hidden")
+        parser.add_argument("--no-attr", type=attributes, default=0, help="excluded attributes, e.g. dir")
+        try:
+            args = parser.parse_args(split_args(arg))
+        except SystemExit:
+            return
+
+        try:
+            results = self.vol.find(args.pattern, regex=args.regex, minSize=args.min_size, maxSize=args.max_size,
+                                    after=args.after, before=args.before, attributes=args.attr,
+                                    excludeAttributes=args.no_attr)
+            for path, obj in results:
+                print(f'{path:<60} | {obj["Date Modified"]} | Size: {obj["Size"]}')
+            print(f"{len(results)} match(es)")
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    def do_extract(self, arg):
+        parser = argparse.ArgumentParser(prog="extract")
+        parser.add_argument("source", help="file or directory on the volume")
+        parser.add_argument("destination", help="host directory receiving the copy")
+        parser.add_argument("--workers", type=int, default=WORKERS, help="files copied at the same time")
+        parser.add_argument("--no-resume", action="store_true", help="copy again files extracted by an earlier run")
+        try:
+            args = parser.parse_args(split_args(arg))
+        except SystemExit:
+            return
+
+        shown = [0.0]
+
+        def progress(stats):
+            # Refresh the status line at most twice a second
+            if stats["seconds"] - shown[0] < 0.5:
                 return
+            shown[0] = stats["seconds"]
+            print(f'\r{stats["files"]} file(s), {stats["MB/s"]:.1f} MB/s, {stats["files/s"]:.1f} files/s', end="")
 
-            self.vol.changeDirectory(entry["Name"])
-            entries = self.vol.getDirectory()
-            numberOfEntry = len(entries)
+        try:
+            stats = extract(self.vol, args.source, args.destination, workers=args.workers,
+                            resume=not args.no_resume, progress=progress)
+            print(f'\rExtracted {stats["files"]} file(s), {stats["bytes"]} bytes in {stats["seconds"]:.2f}s '
+                  f'({stats["MB/s"]:.1f} MB/s, {stats["files/s"]:.1f} files/s), '
+                  f'{stats["skipped"]} already present, {stats["failed"]} failed')
+        except Exception as e:
+            print(f"[ERROR] {e}")
 
-            for i in range(numberOfEntry):
-                if entries[i]["Name"] in (".", ".."):
-                    continue
-                prefixChar = "    " if last else "│   "
-                printTree(entries[i], prefix + prefixChar, i == numberOfEntry - 1)
+    def do_hash(self, arg):
+        parser = argparse.ArgumentParser(prog="hash")
+        parser.add_argument("path", nargs="?", default="", help="file or directory, the current one by default")
+        parser.add_argument("--manifest", help="output file, CSV or JSON lines when it ends in .jsonl")
+        parser.add_argument("--algorithms", default=",".join(ALGORITHMS), help="hashlib names, e.g. md5,sha1")
+        parser.add_argument("--workers", type=int, default=WORKERS, help="files hashed at the same time")
+        try:
+            args = parser.parse_args(split_args(arg))
+        except SystemExit:
+            return
 
-            self.vol.changeDirectory("..")
+        def show(path, obj, size, digests):
+            print(f'{" ".join(digests)}  {path}')
 
-        cwd = self.vol.getCWD()
         try:
-            print(cwd)
-            entries = self.vol.getDirectory()
-            numberOfEntry = len(entries)
+            stats = hash_files(self.vol, args.path, args.manifest, args.algorithms.split(","), args.workers,
+                               callback=None if args.manifest else show)
+            print(f'Hashed {stats["files"]} file(s), {stats["bytes"]} bytes in {stats["seconds"]:.2f}s '
+                  f'({stats["MB/s"]:.1f} MB/s, {stats["files/s"]:.1f} files/s), {stats["failed"]} failed')
+        except Exception as e:
+            print(f"[ERROR] {e}")
 
-            for i in range(numberOfEntry):
-                if entries[i]["Name"] in (".", ".."):
-                    continue
-                printTree(entries[i], "", i == numberOfEntry - 1)
+    def do_catalog(self, arg):
+        parser = argparse.ArgumentParser(prog="catalog")
+        parser.add_argument("output", help="CSV file, or .npz for NumPy columns")
+        parser.add_argument("--workers", type=int, default=1, help="processes scanning $MFT (NTFS)")
+        try:
+            args = parser.parse_args(split_args(arg))
+        except SystemExit:
+            return
 
+        try:
+            start = time.perf_counter()
+            catalog = self.vol.scanCatalog(args.workers)
+            catalog.export(args.output)
+            print(f"Exported {len(catalog)} entries to {args.output} in {time.perf_counter() - start:.2f}s")
         except Exception as e:
             print(f"[ERROR] {e}")
-        finally:
-            self.vol.changeDirectory(cwd)
 
-    def do_data(self, arg):
-        if arg == "":
-            print(f"[ERROR] Please provide a path")
+    def do_stats(self, arg):
+        parser = argparse.ArgumentParser(prog="stats")
+        parser.add_argument("action", nargs="?", choices=["show", "reset"], default="show")
+        parser.add_argument("--json", metavar="FILE", help="write the statistics as JSON, '-' for the screen")
+        try:
+            args = parser.parse_args(split_args(arg))
+        except SystemExit:
+            return
+
+        if args.action == "reset":
+            self.vol.stats.reset()
             return
         try:
-            print(self.vol.getText(arg))
+            stats = self.vol.getStats()
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            return
+        if args.json == "-":
+            print(json.dumps(stats, indent=2))
+            return
+        if args.json:
+            try:
+                with open(args.json, "w") as fd:
+                    json.dump(stats, fd, indent=2)
+            except Exception as e:
+                print(f"[ERROR] {e}")
+            return
+
+        if not stats["enabled"]:
+            print("Instrumentation is off, start the program with --stats to collect it.")
+        for name, phase in sorted(stats["phases"].items(), key=lambda item: -item[1]["seconds"]):
+            print(f'{name:<20} {phase["seconds"]:>10.4f}s {phase["calls"]:>10} call(s)')
+        for name, value in sorted(stats["counters"].items()):
+            print(f'{name:<20} {value:>11}')
+        for cache in ("directory cache", "block cache"):
+            if cache in stats:
+                print(f"{cache}: " + ", ".join(f"{key} {value:.2%}" if key == "hit rate" else f"{key} {value}"
+                                               for key, value in stats[cache].items()))
 
+    def do_refresh(self, arg):
+        if not hasattr(self.vol, "refresh"):
+            print("[ERROR] Only NTFS volumes can be refreshed.")
+            return
+        try:
+            summary = self.vol.refresh()
         except Exception as e:
             print(f"[ERROR] {e}")
+            return
+        print(f'{summary["changed"]} of {summary["chunks"]} MFT chunk(s) changed, '
+              f'{summary["records"]} record(s) reparsed.')
 
     def do_info(self, arg):
         print(self.vol)
@@ -0,0 +1,273 @@
+"""Benchmarks of the FAT32 and NTFS readers on generated images.
+
+Generates one image per filesystem with ImageGen, times mounting, listing,
+tree, path resolution, reads and the bulk commands, and prints the results
+as JSON (or writes them with --output) so runs can be compared:
+
+    python benchmark.py --size-mb 256 --files 20000 --output results.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import ImageGen
+from Device import open_device
+from Extract import extract
+from FAT32 import Fat32_Main
+from Hash import hash_files
+from NTFS import NTFS
+from UI import UI
+
+ROOTS = {"fat32": "X:", "ntfs": "Y:"}
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def timed(function, repeat=1):
+    # Best of repeat runs, with the result of the last one
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def mount(kind, image, backend="auto", cache=0, **options):
+    device = open_device(image, backend, cache=cache)
+    if kind == "fat32":
+        return Fat32_Main(ROOTS[kind], device, **options)
+    return NTFS(ROOTS[kind], device, **options)
+
+
+def unmount(volume):
+    volume.device.close()
+    del volume
+    gc.collect()
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else 0.0
+
+
+def bench_common(kind, image, manifest, args) -> dict:
+    root = ROOTS[kind]
+    paths = [root + "\\" + path for path in manifest]
+    total = sum(len(body) for body in manifest.values())
+    rnd = random.Random(args.seed)
+    result = {}
+
+    seconds, volume = timed(lambda: mount(kind, image, args.backend), args.repeat)
+    result["mount"] = seconds
+    unmount(volume)
+    volume = mount(kind, image, args.backend)
+
+    result["list root"], _ = timed(lambda: volume.getDirectory(root), args.repeat)
+    seconds, entries = timed(lambda: sum(len(dirs) + len(files) for _, dirs, files in volume.walk(root)),
+                             args.repeat)
+    result["walk"] = seconds
+    result["walk entries"] = entries
+    result["tree"], _ = timed(lambda: UI(volume).do_tree(root), args.repeat)
+
+    sample = rnd.sample(paths, min(len(paths), args.lookups))
+
+    def resolve():
+        for path in sample:
+            volume.open(path).close()
+    seconds, _ = timed(resolve, args.repeat)
+    result["resolve per path"] = seconds / max(len(sample), 1)
+
+    def read_all():
+        for path in paths:
+            with volume.open(path) as stream:
+                stream.readall()
+    seconds, _ = timed(read_all, args.repeat)
+    result["read"] = seconds
+    result["read MB/s"] = rate(total / 2 ** 20, seconds)
+
+    seconds, _ = timed(lambda: sum(len(data) for _, data in volume.readFiles(paths)), args.repeat)
+    result["batch read"] = seconds
+    result["batch read MB/s"] = rate(total / 2 ** 20, seconds)
+
+    volume.catalog = None
+    result["find first"], _ = timed(lambda: volume.find("*.txt"))
+    patterns = [os.path.basename(path)[:8] + "*" for path in sample[:100]]
+    seconds, _ = timed(lambda: [volume.find(pattern) for pattern in patterns], args.repeat)
+    result["find per query"] = seconds / max(len(patterns), 1)
+
+    seconds, stats = timed(lambda: hash_files(volume, root, workers=args.workers))
+    result["hash"] = seconds
+    result["hash GB/s"] = rate(stats["bytes"] / 2 ** 30, seconds)
+
+    dest = tempfile.mkdtemp(prefix="bench-extract-")
+    try:
+        seconds, stats = timed(lambda: extract(volume, root, dest, workers=args.workers, resume=False))
+        result["extract"] = seconds
+        result["extract MB/s"] = rate(stats["bytes"] / 2 ** 20, seconds)
+        result["extract files/s"] = rate(stats["files"], seconds)
+    finally:
+        shutil.rmtree(dest, ignore_errors=True)
+
+    unmount(volume)
+    result.update(bench_cache(kind, image, manifest, args))
+    return result
+
+
+def bench_cache(kind, image, manifest, args) -> dict:
+    """Repeated tree and data commands on the file backend, without and with the block cache."""
+    root = ROOTS[kind]
+    sample = random.Random(args.seed).sample(list(manifest), min(len(manifest), args.lookups // 4 or 1))
+    result = {}
+    for label, cache in (("uncached", 0), ("cached", args.cache_mb * 2 ** 20)):
+        volume = mount(kind, image, "file", cache=cache)
+        ui = UI(volume)
+
+        def commands():
+            ui.do_tree(root)
+            for path in sample:
+                ui.do_data(root + "\\" + path)
+        result[f"tree+data {label}"], _ = timed(commands, max(args.repeat, 3))
+        if cache:
+            result["cache hit rate"] = volume.device.stats()["hit rate"]
+        unmount(volume)
+    return result
+
+
+def bench_fat32(image, manifest, args) -> dict:
+    result = {}
+    volume = mount("fat32", image, args.backend)
+    fat = volume.list_FAT[0]
+    starts = [volume.find_file("X:\\" + path).start_cluster for path in manifest]
+
+    # Chain walks must not grow memory once the FAT sectors are decoded
+    tracemalloc.start()
+    for start in starts:
+        fat.get_cluster_chain(start)
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(5):
+        for start in starts:
+            fat.get_cluster_chain(start)
+    result["chain walk memory growth"] = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    unmount(volume)
+
+    # Walking must not lose directories when the table cache evicts everything
+    volume = mount("fat32", image, args.backend, det_cache_bytes=1)
+    walked = sum(len(files) for _, _, files in volume.walk("X:"))
+    if walked != len(manifest):
+        raise Exception(f"walk with an evicting cache found {walked} of {len(manifest)} files")
+    result["walk with evicting cache"] = walked
+    unmount(volume)
+
+    # Resident size of parsed directory tables per entry slot
+    tracemalloc.start()
+    volume = mount("fat32", image, args.backend, det_cache_bytes=2 ** 40)
+    slots = 0
+    for _ in volume.walk("X:"):
+        pass
+    for table in list(volume.DET.tables.values()) + list(volume.DET.pinned.values()):
+        slots += len(table.raw_data) // 32
+    result["bytes per directory slot"] = tracemalloc.get_traced_memory()[0] / max(slots, 1)
+    tracemalloc.stop()
+    unmount(volume)
+    return result
+
+
+def bench_ntfs(image, manifest, args) -> dict:
+    result = {}
+    result["mount lazy"], volume = timed(lambda: mount("ntfs", image, args.backend, lazy=True), args.repeat)
+    unmount(volume)
+    for workers in sorted({1, args.workers}):
+        seconds, volume = timed(lambda: mount("ntfs", image, args.backend, workers=workers), args.repeat)
+        result[f"mount {workers} worker(s)"] = seconds
+        unmount(volume)
+
+    volume = mount("ntfs", image, args.backend, lazy=True)
+    result["catalog scan"], _ = timed(lambda: volume.scanCatalog(), args.repeat)
+    unmount(volume)
+
+    tracemalloc.start()
+    volume = mount("ntfs", image, args.backend)
+    result["bytes per record"] = tracemalloc.get_traced_memory()[0] / max(len(volume.dirTree.nodeDict), 1)
+    tracemalloc.stop()
+    unmount(volume)
+    return result
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fs", choices=["fat32", "ntfs", "both"], default="both")
+    parser.add_argument("--size-mb", type=int, default=128, help="image size")
+    parser.add_argument("--files", type=int, default=2000, help="number of files")
+    parser.add_argument("--depth", type=int, default=3, help="directory levels")
+    parser.add_argument("--fanout", type=int, default=3, help="subdirectories per directory")
+    parser.add_argument("--file-kb", type=int, default=8, help="size of each file")
+    parser.add_argument("--frag", type=int, default=0, help="clusters per fragment, 0 for contiguous files")
+    parser.add_argument("--backend", choices=["auto", "file", "mmap", "memory"], default="auto")
+    parser.add_argument("--cache-mb", type=int, default=32, help="block cache used by the cached runs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel workers")
+    parser.add_argument("--lookups", type=int, default=1000, help="random paths resolved")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per measurement, the best is kept")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="where images are written, a temporary directory by default")
+    parser.add_argument("--output", help="JSON file for the results instead of stdout")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    os.makedirs(workdir, exist_ok=True)
+    results = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+    }
+    generators = {"fat32": (ImageGen.make_fat32, bench_fat32), "ntfs": (ImageGen.make_ntfs, bench_ntfs)}
+    try:
+        for kind in (["fat32", "ntfs"] if args.fs == "both" else [args.fs]):
+            generate, specific = generators[kind]
+            image = os.path.join(workdir, f"{kind}.img")
+            log(f"[{kind}] generating {args.size_mb} MiB image with {args.files} files")
+            seconds, manifest = timed(lambda: generate(image, args.size_mb, args.files, args.depth, args.fanout,
+                                                       args.file_kb, args.frag))
+            results[kind] = {"generate": seconds, "files": len(manifest),
+                             "bytes": sum(len(body) for body in manifest.values())}
+            # Volumes print while listing and closing; keep stdout for the results
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                log(f"[{kind}] running")
+                results[kind].update(bench_common(kind, image, manifest, args))
+                results[kind].update(specific(image, manifest, args))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as fd:
+            fd.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
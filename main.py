@@ -1,34 +1,70 @@
 from FAT32 import Fat32_Main
 from UI import UI
 from NTFS import NTFS
+from Device import open_device
+from Stats import Stats
+import argparse
 import os
 
 
+def clearScreen():
+    os.system("cls" if os.name == "nt" else "clear")
+
+
 if __name__ == "__main__":
-    os.system("cls")
-    volumes = [chr(x) + ":" for x in range(65, 91) if os.path.exists(chr(x) + ":")]
-    print("Available volumes in your computer:")
-    for i in range(len(volumes)):
-        print(f"{i + 1}.", volumes[i])
-    try:
-        volumeChoice = int(input("Which volume you want to use: "))
-    except Exception as e:
-        print(f"[ERROR] {e}")
-        exit()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image", nargs="?", help="disk image to read instead of a drive")
+    parser.add_argument("--lazy", action="store_true", help="load NTFS records on demand instead of at mount")
+    parser.add_argument("--workers", type=int, default=1, help="processes used to parse the NTFS MFT")
+    parser.add_argument("--det-cache-mb", type=int, default=64, help="memory budget for cached FAT32 directory tables")
+    parser.add_argument("--index", help="sidecar file caching parsed NTFS records between runs")
+    parser.add_argument("--cache-mb", type=int, default=32,
+                        help="block cache for drives and non-mapped images, 0 to disable")
+    parser.add_argument("--stats", action="store_true", help="count I/O and time parsing phases, see 'stats'")
+    args = parser.parse_args()
+    stats = Stats() if args.stats else None
 
-    if not 1 <= volumeChoice <= len(volumes):
-        print("[ERROR] Invalid choice!")
-        exit()
+    clearScreen()
+    if args.image:
+        try:
+            device = open_device(args.image, cache=args.cache_mb * 1024 * 1024, stats=stats)
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            exit()
+        volume_name = os.path.basename(args.image)
+    else:
+        volumes = [chr(x) + ":" for x in range(65, 91) if os.path.exists(chr(x) + ":")]
+        print("Available volumes in your computer:")
+        for i in range(len(volumes)):
+            print(f"{i + 1}.", volumes[i])
+        try:
+            volumeChoice = int(input("Which volume you want to use: "))
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            exit()
+
+        if not 1 <= volumeChoice <= len(volumes):
+            print("[ERROR] Invalid choice!")
+            exit()
+
+        volume_name = volumes[volumeChoice - 1]
+        try:
+            device = open_device(volume_name, cache=args.cache_mb * 1024 * 1024, stats=stats)
+        except PermissionError:
+            print("[ERROR] Permission denied, try again as admin/root")
+            exit()
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            exit()
 
-    volume_name = volumes[volumeChoice - 1]
-    if Fat32_Main.isFAT32(volume_name):
-        vol = Fat32_Main(volume_name)
-    elif NTFS.isNTFS(volume_name):
-        vol = NTFS(volume_name)
+    if Fat32_Main.isFAT32(volume_name, device):
+        vol = Fat32_Main(volume_name, device, det_cache_bytes=args.det_cache_mb * 1024 * 1024, stats=stats)
+    elif NTFS.isNTFS(volume_name, device):
+        vol = NTFS(volume_name, device, lazy=args.lazy, workers=args.workers, index=args.index, stats=stats)
     else:
         print("[ERROR] This volume type is unsupported")
         exit()
 
-    os.system("cls")
+    clearScreen()
     ui = UI(vol)
     ui.cmdloop()